@@ -2,9 +2,9 @@ from enum import Enum
 
 
 class OutputFilePaths(Enum):
-    SAFETY_ANALYSIS = "safety_analysis.json"
-    USER_PROFILE = "user_profile.json"
-    AMENITIES_EVALUATION = "amenities_evaluation.json"
-    BUDGET_ANALYSIS = "budget_analysis.json"
-    LIFESTYLE_MATCHING = "lifestyle_matching.json"
-    REVIEWS_COLLECTION = "reviews_collection.json"
+    SAFETY_ANALYSIS = "safety_analysis.jsonl"
+    USER_PROFILE = "user_profile.jsonl"
+    AMENITIES_EVALUATION = "amenities_evaluation.jsonl"
+    BUDGET_ANALYSIS = "budget_analysis.jsonl"
+    LIFESTYLE_MATCHING = "lifestyle_matching.jsonl"
+    REVIEWS_COLLECTION = "reviews_collection.jsonl"
@@ -0,0 +1,35 @@
+import inspect
+import threading
+
+from agents.neighborhoodAgents import NeighborhoodAgents
+
+
+class AgentRegistry:
+    """Builds NeighborhoodAgents agents on first request and reuses them.
+
+    Agents are referred to by their NeighborhoodAgents factory name, so a
+    crew only pays for the agents its tasks actually ask for. Factories
+    that take a preferences argument receive the crew's user preferences.
+    """
+
+    def __init__(self, user_preferences, agents=None):
+        self.user_preferences = user_preferences
+        self.agents = agents or NeighborhoodAgents()
+        self._built = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._built:
+                factory = getattr(self.agents, name, None)
+                if factory is None:
+                    raise KeyError(f"Unknown agent '{name}'")
+                if "preferences" in inspect.signature(factory).parameters:
+                    self._built[name] = factory(self.user_preferences)
+                else:
+                    self._built[name] = factory()
+            return self._built[name]
+
+    def built(self):
+        with self._lock:
+            return list(self._built.values())
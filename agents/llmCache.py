@@ -0,0 +1,229 @@
+import hashlib
+import os
+import time
+from typing import ClassVar, Optional
+
+import groq
+import openai
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import CallbackManager
+from langchain_core.globals import set_llm_cache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import ChatResult
+from langchain_groq import ChatGroq
+from langchain_openai import ChatOpenAI
+
+from tools.disk_cache import DiskCache
+from tools.rate_limiter import backoff_delay, rate_limiter
+from tools.text_chunker import count_tokens
+
+LLM_NAMESPACE = "llm"
+# Completion tokens reserved per call when max_tokens is not set; the token
+# bucket is corrected with the reported usage afterwards.
+COMPLETION_TOKEN_ESTIMATE = 500
+
+
+class LLMCacheMode:
+    LIVE = "live"
+    RECORD = "record"
+    REPLAY = "replay"
+
+    ALL = (LIVE, RECORD, REPLAY)
+
+
+class LLMCacheMissError(Exception):
+    pass
+
+
+class DiskLLMCache(BaseCache):
+    """LangChain LLM cache stored in a DiskCache.
+
+    LangChain passes the serialized messages as the prompt and the model
+    parameters (model name, temperature, bound tool schemas, stop words) as
+    the llm_string, so both go into the key. In record mode identical
+    prompts are answered from the cache and new ones are saved; in replay
+    mode a miss raises LLMCacheMissError instead of calling the API.
+    """
+
+    def __init__(self, cache, mode=LLMCacheMode.RECORD):
+        if mode not in (LLMCacheMode.RECORD, LLMCacheMode.REPLAY):
+            raise ValueError(f"Unsupported LLM cache mode: {mode}")
+        self.cache = cache
+        self.mode = mode
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        generations = self.cache.get(LLM_NAMESPACE, self._key(prompt, llm_string))
+        if generations is None:
+            if self.mode == LLMCacheMode.REPLAY:
+                raise LLMCacheMissError(
+                    "No recorded completion for this prompt; "
+                    "record it first with LLM_CACHE_MODE=record"
+                )
+            return None
+        return [loads(generation) for generation in generations]
+
+    def update(self, prompt, llm_string, return_val):
+        self.cache.set(
+            LLM_NAMESPACE,
+            self._key(prompt, llm_string),
+            [dumps(generation) for generation in return_val],
+        )
+
+    def clear(self, **kwargs):  # noqa: ARG002 (BaseCache signature)
+        self.cache.clear(LLM_NAMESPACE)
+
+
+class _RateLimitedChat:
+    """stream() through invoke(), and cache misses through a rate limiter.
+
+    crewai agents read completions with stream(), but LangChain only consults
+    the LLM cache from invoke()/generate(); the agents never show partial
+    tokens, so nothing is lost by answering in one piece.
+
+    Calls that miss the cache go through the process-wide rate limiter of
+    the provider, which paces requests and tokens and adapts concurrency to
+    429s. The provider client would absorb 429s in its own retries, hiding
+    them from the limiter, so subclasses set max_retries to 0 and _generate
+    retries instead.
+    """
+
+    rate_limiter_name: ClassVar[str]
+    rate_limit_error: ClassVar[type]
+    transient_errors: ClassVar[tuple]
+
+    def stream(self, input, config=None, *, stop=None, **kwargs):
+        yield self.invoke(input, config=config, stop=stop, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = rate_limiter(self.rate_limiter_name)
+        estimate = sum(count_tokens(str(message.content)) for message in messages)
+        estimate += self.max_tokens or COMPLETION_TOKEN_ESTIMATE
+        attempt = 0
+        while True:
+            with limiter.slot(tokens=estimate) as call:
+                try:
+                    result = super()._generate(messages, stop, run_manager, **kwargs)
+                except self.rate_limit_error as e:
+                    # Refund before throttling, so the pause still empties the bucket
+                    call.failed()
+                    if attempt >= self.retries:
+                        raise
+                    call.throttled(
+                        backoff_delay(
+                            attempt, retry_after=e.response.headers.get("retry-after")
+                        )
+                    )
+                    attempt += 1
+                    continue
+                except self.transient_errors:
+                    call.failed()
+                    if attempt >= self.retries:
+                        raise
+                    delay = backoff_delay(attempt)
+                except Exception:
+                    call.failed()
+                    raise
+                else:
+                    usage = (result.llm_output or {}).get("token_usage") or {}
+                    call.succeeded(usage.get("total_tokens"))
+                    return result
+            time.sleep(delay)
+            attempt += 1
+
+
+class CachingChatOpenAI(_RateLimitedChat, ChatOpenAI):
+    """ChatOpenAI answering from the LLM cache and paced by the "openai" limiter."""
+
+    rate_limiter_name: ClassVar[str] = "openai"
+    rate_limit_error: ClassVar[type] = openai.RateLimitError
+    transient_errors: ClassVar[tuple] = (
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+    max_retries: int = 0
+    retries: int = 4
+
+
+class CachingChatGroq(_RateLimitedChat, ChatGroq):
+    """ChatGroq answering from the LLM cache and paced by the "groq" limiter."""
+
+    rate_limiter_name: ClassVar[str] = "groq"
+    rate_limit_error: ClassVar[type] = groq.RateLimitError
+    transient_errors: ClassVar[tuple] = (
+        groq.APIConnectionError,
+        groq.InternalServerError,
+    )
+
+    max_retries: int = 0
+    retries: int = 4
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model that lets agents.modelRouter pick the model of every call.
+
+    Agents and tool-internal calls hold one RoutedChatModel per route; the
+    selected model does the caching, rate limiting and metrics itself. It
+    runs as a child of this model's run with the inheritable callbacks,
+    and its llm_output (token usage, model name) is passed on, so callbacks
+    attached here see the call.
+    model_name is the route's model before any budget downgrade; crewai
+    only attaches its token counter to LLMs that have one.
+    """
+
+    route: str
+    model_name: str = ""
+    cache: Optional[bool] = False
+
+    @property
+    def _llm_type(self):
+        return "routed"
+
+    @property
+    def _identifying_params(self):
+        return {"route": self.route}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        from agents.modelRouter import select_model
+
+        callbacks = None
+        if run_manager is not None:
+            # LLM run managers have no get_child(); this is the same child
+            # manager ParentRunManager.get_child() builds
+            callbacks = CallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+            callbacks.set_handlers(run_manager.inheritable_handlers)
+            callbacks.add_tags(run_manager.inheritable_tags)
+            callbacks.add_metadata(run_manager.inheritable_metadata)
+        result = select_model(self.route).generate(
+            [messages], stop=stop, callbacks=callbacks, **kwargs
+        )
+        return ChatResult(
+            generations=result.generations[0], llm_output=result.llm_output
+        )
+
+
+def configure_llm_cache(mode=None):
+    """Install the process-wide LLM cache for the given (or LLM_CACHE_MODE) mode."""
+    mode = mode or os.environ.get("LLM_CACHE_MODE", LLMCacheMode.LIVE)
+    if mode not in LLMCacheMode.ALL:
+        raise ValueError(
+            f"LLM_CACHE_MODE must be one of {', '.join(LLMCacheMode.ALL)}, got '{mode}'"
+        )
+    if mode == LLMCacheMode.LIVE:
+        set_llm_cache(None)
+        return None
+
+    cache = DiskLLMCache(
+        DiskCache(
+            os.environ.get("LLM_CACHE_PATH", "./workdir/llm_cache.sqlite"),
+            max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "50000")),
+        ),
+        mode=mode,
+    )
+    set_llm_cache(cache)
+    return cache
@@ -0,0 +1,148 @@
+import os
+import threading
+
+# Model of each tier as "<backend>:<model>"; the backends are openai and groq.
+MODEL_TIERS = {
+    "large": os.environ.get("MODEL_TIER_LARGE", "openai:gpt-4o"),
+    "small": os.environ.get("MODEL_TIER_SMALL", "openai:gpt-4o-mini"),
+}
+# Tiers from most to least capable; a task over budget moves one step down.
+TIER_ORDER = ("large", "small")
+DEFAULT_TIER = "large"
+BACKEND_API_KEYS = {"openai": "OPENAI_API_KEY", "groq": "GROQ_API_KEY"}
+
+# Tier of each agent (by NeighborhoodAgents factory name) and of each LLM call
+# made inside a tool; routes not listed use DEFAULT_TIER.
+ROUTES = {
+    "lifestyle_preferences_agent": "small",
+    "reviews_search_agent": "small",
+    "chunk_summary": "small",
+    "summary_reduce": "small",
+    "narrative": "small",
+}
+
+# LLM tokens and seconds of LLM time a task may spend before its remaining
+# calls are downgraded one tier; 0 disables a budget.
+TASK_TOKEN_BUDGET = int(os.environ.get("TASK_TOKEN_BUDGET", "40000"))
+TASK_LATENCY_BUDGET = float(os.environ.get("TASK_LATENCY_BUDGET", "120"))
+
+TEMPERATURE = 0.7
+
+
+def parse_routes(text):
+    """{route: tier} from text such as "reviews_search_agent=large,narrative=small"."""
+    routes = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        route, _, tier = item.partition("=")
+        if tier.strip() not in MODEL_TIERS:
+            raise ValueError(
+                f"Unknown model tier '{tier.strip()}' for route '{route.strip()}' "
+                "in MODEL_ROUTES"
+            )
+        routes[route.strip()] = tier.strip()
+    return routes
+
+
+ROUTES.update(parse_routes(os.environ.get("MODEL_ROUTES", "")))
+
+
+def split_spec(spec):
+    backend, _, model = spec.partition(":")
+    if backend not in BACKEND_API_KEYS or not model:
+        raise ValueError(
+            f"Model '{spec}' must look like <backend>:<model> with backend "
+            f"{' or '.join(BACKEND_API_KEYS)}"
+        )
+    return backend, model
+
+
+def required_api_keys():
+    """Environment variables holding the API keys of the backends the tiers use."""
+    return sorted(
+        {BACKEND_API_KEYS[split_spec(spec)[0]] for spec in MODEL_TIERS.values()}
+    )
+
+
+def select_tier(route, usage=None):
+    """(tier, reason) for the next call of route.
+
+    usage holds the LLM calls the current task has made so far (a run
+    metrics stats entry); past either budget, the route's tier is lowered
+    by one step.
+    """
+    tier = ROUTES.get(route, DEFAULT_TIER)
+    if usage is None:
+        return tier, "route"
+    over = []
+    if (
+        TASK_TOKEN_BUDGET
+        and usage.prompt_tokens + usage.completion_tokens > TASK_TOKEN_BUDGET
+    ):
+        over.append("token budget")
+    if TASK_LATENCY_BUDGET and usage.seconds > TASK_LATENCY_BUDGET:
+        over.append("latency budget")
+    position = TIER_ORDER.index(tier)
+    if not over or position == len(TIER_ORDER) - 1:
+        return tier, "route"
+    return TIER_ORDER[position + 1], "over " + " and ".join(over)
+
+
+_models = {}
+_routed = {}
+_lock = threading.Lock()
+
+
+def chat_model(spec):
+    """The process-wide chat model for a "<backend>:<model>" spec.
+
+    Each model is created on first use.
+    """
+    with _lock:
+        if spec not in _models:
+            from agents.llmCache import CachingChatGroq, CachingChatOpenAI
+            from tools.run_metrics import metrics_callback
+
+            backend, model = split_spec(spec)
+            if backend == "groq":
+                _models[spec] = CachingChatGroq(
+                    model_name=model,
+                    temperature=TEMPERATURE,
+                    groq_api_key=os.environ["GROQ_API_KEY"],
+                    callbacks=[metrics_callback],
+                )
+            else:
+                _models[spec] = CachingChatOpenAI(
+                    model_name=model,
+                    temperature=TEMPERATURE,
+                    openai_api_key=os.environ["OPENAI_API_KEY"],
+                    callbacks=[metrics_callback],
+                )
+        return _models[spec]
+
+
+def select_model(route):
+    """The chat model for the next call of route, recorded in the run metrics."""
+    from tools.run_metrics import current_metrics, current_scope
+
+    metrics = current_metrics()
+    agent, task = current_scope()
+    usage = metrics.llm_usage(agent, task) if metrics is not None else None
+    tier, reason = select_tier(route, usage)
+    if metrics is not None:
+        metrics.record_route(agent, task, route, MODEL_TIERS[tier], reason)
+    return chat_model(MODEL_TIERS[tier])
+
+
+def routed_llm(route):
+    """The LLM to hand to an agent or tool-internal call: one per route."""
+    with _lock:
+        if route not in _routed:
+            from agents.llmCache import RoutedChatModel
+
+            _routed[route] = RoutedChatModel(
+                route=route,
+                model_name=split_spec(MODEL_TIERS[ROUTES.get(route, DEFAULT_TIER)])[1],
+            )
+        return _routed[route]
@@ -1,27 +1,20 @@
-import os
 from textwrap import dedent
 
 from crewai import Agent
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
 
+from agents.modelRouter import routed_llm
 from tasks.neighborhoodTasks import OutputFilePaths
+from tools.affordability_tools import AffordabilityTools
 from tools.browser_tools import BrowserTools
 from tools.calculator_tools import CalculatorTools
+from tools.corpus_index import CorpusTools
 from tools.file_tools import FileTools
 from tools.search_tools import SearchTools
 
 
 class NeighborhoodAgents:
-    def __init__(self):
-        self.OpenAIGPT4OMNI = ChatOpenAI(
-            model_name="gpt-4o",
-            temperature=0.7,
-            openai_api_key=os.environ["OPENAI_API_KEY"],
-        )
-        # self.GROQ_LLM = ChatGroq(
-        #     api_key=os.environ["GROQ_API_KEY"], model="1lama3-70b-8192"
-        # )
+    # Each agent's LLM is routed to a model tier by its factory name; see
+    # agents.modelRouter.ROUTES.
 
     def neighborhood_research_manager(self):
         output_file_paths = [file_path.value for file_path in OutputFilePaths]
@@ -36,6 +29,7 @@ class NeighborhoodAgents:
             Keep reasonable amount of delegation to agents. Be contius about the tokens cost for response. File pathes for collected data: {output_file_paths}"""),
             tools=[
                 BrowserTools.scrape_and_summarize_website,
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 FileTools.read_file,
             ],
@@ -49,7 +43,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the overall evaluation]
             """),
             max_iter=12,
-            max_max_rpm=30,  # limitaion for groq api
+            llm=routed_llm("neighborhood_research_manager"),
             verbose=True,
         )
 
@@ -61,6 +55,7 @@ class NeighborhoodAgents:
             goal=dedent("""Collect and analyze safety data to provide a comprehensive safety score for each
             neighborhood. Be contius about the tokens cost for response."""),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -72,6 +67,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the safety analysis]
             """),
             max_iter=3,
+            llm=routed_llm("safety_research_agent"),
             verbose=True,
         )
 
@@ -90,6 +86,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the matching process]
             """),
             max_iter=3,
+            llm=routed_llm("lifestyle_preferences_agent"),
             verbose=True,
         )
 
@@ -101,6 +98,7 @@ class NeighborhoodAgents:
             goal=dedent("""Ensure that the recommended neighborhoods are within the user's budget by evaluating
             affordability. Be contius about the tokens cost for response."""),
             tools=[
+                AffordabilityTools.analyze_affordability,
                 CalculatorTools.calculate,
             ],
             format_guidelines=dedent("""
@@ -110,7 +108,10 @@ class NeighborhoodAgents:
                 - Cost of Living: [Summary of the cost of living in the neighborhood]
                 - Summary: [Brief summary of the affordability analysis]
             """),
-            max_iter=2,
+            # crewai forces the final answer at max_iter - 2; this leaves room
+            # for one tool call
+            max_iter=3,
+            llm=routed_llm("budget_and_affordability_agent"),
             verbose=True,
         )
 
@@ -123,6 +124,7 @@ class NeighborhoodAgents:
             goal=dedent("""Provide a comprehensive amenities score for each neighborhood based on the evaluation of
             various amenities. Be contius about the tokens cost for response."""),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -134,6 +136,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the amenities evaluation]
             """),
             max_iter=2,
+            llm=routed_llm("amenities_evaluation_agent"),
             verbose=True,
         )
 
@@ -146,6 +149,7 @@ class NeighborhoodAgents:
                 f"""Score neighborhoods based on the quality and availability of educational amenities. Analyze schools only if schools are present in location: {preferences['facilities']} Be contius about the tokens cost for response."""
             ),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -157,6 +161,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the education evaluation]
             """),
             max_iter=2,
+            llm=routed_llm("schools_and_education_agent"),
             verbose=True,
         )
 
@@ -169,6 +174,7 @@ class NeighborhoodAgents:
             goal=dedent("""Score neighborhoods based on the availability and quality of parks and recreational
             facilities. Be contius about the tokens cost for response."""),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -180,6 +186,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the parks and recreation evaluation]
             """),
             max_iter=2,
+            llm=routed_llm("parks_and_recreation_agent"),
             verbose=True,
         )
 
@@ -192,6 +199,7 @@ class NeighborhoodAgents:
                 """Score neighborhoods based on the accessibility and quality of public transport options. Be contius about the tokens cost for response."""
             ),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -203,6 +211,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the transport evaluation]
             """),
             max_iter=2,
+            llm=routed_llm("public_transport_agent"),
             verbose=True,
         )
 
@@ -216,6 +225,7 @@ class NeighborhoodAgents:
                 """Score neighborhoods based on the availability and quality of food and drink options. Be contius about the tokens cost for response."""
             ),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -227,6 +237,7 @@ class NeighborhoodAgents:
                 - Summary: [Brief summary of the food and drink evaluation]
             """),
             max_iter=2,
+            llm=routed_llm("food_and_drink_agent"),
             verbose=True,
         )
 
@@ -238,6 +249,7 @@ class NeighborhoodAgents:
             goal=dedent("""Collect and analyze user reviews and descriptions to provide qualitative insights into
             neighborhoods. Be contius about the tokens cost for response."""),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -249,6 +261,7 @@ class NeighborhoodAgents:
                 - Summary: [Summary of common themes and insights from reviews]
                 """),
             max_iter=2,
+            llm=routed_llm("reviews_and_descriptions_agent"),
             verbose=True,
         )
 
@@ -260,6 +273,7 @@ class NeighborhoodAgents:
             goal=dedent("""Collect and analyze user reviews and descriptions to provide qualitative insights into
             neighborhoods. Be contius about the tokens cost for response."""),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
             ],
@@ -271,5 +285,6 @@ class NeighborhoodAgents:
                 - Summary: [Summary of common themes and insights from reviews]
             """),
             max_iter=2,
+            llm=routed_llm("reviews_search_agent"),
             verbose=True,
         )
@@ -0,0 +1,131 @@
+"""Batch neighborhood evaluation over a JSONL file of (city, preferences) records.
+
+Each input line is a JSON object such as
+
+    {"id": "seattle-family", "city": "Seattle", "preferences": {"budget": "..."}}
+
+"id" is optional; without it a stable id is derived from the city and the
+preferences. One JSON line is appended to the output file per finished record,
+and records that already have an "ok" line there are skipped, so an
+interrupted batch resumes where it stopped:
+
+    python batch.py cities.jsonl --output results.jsonl --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def record_id(record):
+    if record.get("id") is not None:
+        return str(record["id"])
+    key = json.dumps(
+        [record.get("city"), record.get("preferences", {})], sort_keys=True
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def read_records(path):
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}") from e
+            yield record
+
+
+def finished_ids(output_path):
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run; the record is redone.
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+def evaluate(record, output_root, mode):
+    from main import NeighborhoodCrew
+
+    rid = record_id(record)
+    started = time.perf_counter()
+    crew = NeighborhoodCrew(
+        record["city"],
+        record.get("preferences", {}),
+        output_dir=os.path.join(output_root, rid),
+    )
+    result = crew.run(mode=mode)
+    return {
+        "id": rid,
+        "city": record["city"],
+        "status": "ok",
+        "seconds": time.perf_counter() - started,
+        "result": str(result),
+    }
+
+
+def run_batch(
+    input_path, output_path, workers=2, output_root="./workdir/batch", mode="parallel"
+):
+    done = finished_ids(output_path)
+    records = [r for r in read_records(input_path) if record_id(r) not in done]
+    print(f"{len(done)} records already finished, {len(records)} to evaluate")
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    write_lock = threading.Lock()
+    with (
+        open(output_path, "a") as out,
+        ThreadPoolExecutor(max_workers=workers) as executor,
+    ):
+        futures = {
+            executor.submit(evaluate, record, output_root, mode): record
+            for record in records
+        }
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {
+                    "id": record_id(record),
+                    "city": record.get("city"),
+                    "status": "error",
+                    "error": f"{type(e).__name__}: {e}",
+                }
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            print(f"[{result['status']}] {result['id']} {result['city']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of (city, preferences) records")
+    parser.add_argument("--output", default="./workdir/batch_results.jsonl")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--mode", choices=["parallel", "sequential"], default="parallel"
+    )
+    args = parser.parse_args()
+    run_batch(args.input, args.output, workers=args.workers, mode=args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Profile cold-start import time with python -X importtime.
+
+Each target is imported in a fresh interpreter; the report lists the total
+import time and the slowest top-level packages, and the wall-clock time of
+`python main.py --help`:
+
+    python -m benchmarks.import_time --output import_time.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+TARGETS = [
+    "main",
+    "batch",
+    "tasks.taskScheduler",
+    "tools.search_tools",
+    "agents.neighborhoodAgents",
+]
+
+
+def profile_import(module):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    packages = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        # Lines look like "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (
+            part.strip() for part in line[len("import time:") :].split("|")
+        )
+        if name == module:
+            total_us = int(cumulative_us)
+        packages[name.split(".")[0]] += int(self_us)
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:10]
+    return {
+        "total_ms": total_us / 1000,
+        "slowest_packages_ms": {name: us / 1000 for name, us in slowest},
+    }
+
+
+def time_help():
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "main.py", "--help"], capture_output=True, check=True
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="import_time.json")
+    parser.add_argument("targets", nargs="*", default=TARGETS)
+    args = parser.parse_args()
+
+    report = {
+        "imports": {module: profile_import(module) for module in args.targets},
+        "main_help_seconds": time_help(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Compare model routing configurations on a replayed NeighborhoodCrew run.
+
+Replays the same offline crew run (against the stubs from
+benchmarks.stub_servers, where the large model answers more slowly than the
+small one) once per configuration, each in a fresh process and working
+directory so no cache carries over:
+
+    python -m benchmarks.routing_benchmark --output routing_results.json
+
+"untiered" sends every call to the large model, "routed" uses the default
+routes of agents.modelRouter and "routed+budget" adds a token budget tight
+enough that tasks are downgraded once they have spent it. Cost is estimated
+from the tokens each model was sent and returned, at PRICES.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+LARGE_MODEL = "gpt-4o"
+SMALL_MODEL = "gpt-4o-mini"
+
+# USD per million (prompt, completion) tokens
+PRICES = {
+    LARGE_MODEL: (5.00, 15.00),
+    SMALL_MODEL: (0.15, 0.60),
+}
+
+CONFIGURATIONS = {
+    "untiered": {
+        "MODEL_TIER_LARGE": f"openai:{LARGE_MODEL}",
+        "MODEL_TIER_SMALL": f"openai:{LARGE_MODEL}",
+    },
+    "routed": {
+        "MODEL_TIER_LARGE": f"openai:{LARGE_MODEL}",
+        "MODEL_TIER_SMALL": f"openai:{SMALL_MODEL}",
+    },
+    "routed+budget": {
+        "MODEL_TIER_LARGE": f"openai:{LARGE_MODEL}",
+        "MODEL_TIER_SMALL": f"openai:{SMALL_MODEL}",
+        "TASK_TOKEN_BUDGET": "1000",
+    },
+}
+
+
+def cost(requests):
+    total = 0.0
+    for model, (prompt_price, completion_price) in PRICES.items():
+        total += requests.get(f"prompt_tokens:{model}", 0) * prompt_price / 1e6
+        total += requests.get(f"completion_tokens:{model}", 0) * completion_price / 1e6
+    return total
+
+
+def run_configuration(args):
+    """Run the crew once with the routing configuration already in the environment."""
+    from benchmarks.run_benchmarks import (
+        PREFERENCES,
+        benchmark_crew,
+        configure_environment,
+        write_cost_table,
+    )
+    from benchmarks.stub_servers import NEIGHBORHOODS, OpenAIStub, SerperStub
+
+    serper = SerperStub(
+        page_paragraphs=args.page_paragraphs, latency=args.serper_latency
+    ).start()
+    openai = OpenAIStub(
+        latency=args.large_latency,
+        model_latency={
+            LARGE_MODEL: args.large_latency,
+            SMALL_MODEL: args.small_latency,
+        },
+    ).start()
+    try:
+        workdir = tempfile.mkdtemp(prefix="neighborhood-routing-")
+        os.chdir(workdir)
+        configure_environment(serper, openai, workdir)
+        write_cost_table(
+            os.path.join(workdir, "workdir", "cost_of_living"), args.city, NEIGHBORHOODS
+        )
+        # Import crewai and the agents before the clock starts
+        import agents.neighborhoodAgents  # noqa: F401
+        import main  # noqa: F401
+
+        wall_clock, _ = benchmark_crew(args.city, "parallel", PREFERENCES)
+        with open("run_metrics.json") as f:
+            metrics = json.load(f)
+    finally:
+        serper.stop()
+        openai.stop()
+    requests = dict(openai.requests)
+    return {
+        "wall_clock_seconds": wall_clock,
+        # Time spent waiting for the LLM, summed over every task
+        "llm_seconds": sum(row["seconds"] for row in metrics["llm"]),
+        "llm_calls": {model: requests.get(f"chat:{model}", 0) for model in PRICES},
+        "tokens": {
+            model: requests.get(f"prompt_tokens:{model}", 0)
+            + requests.get(f"completion_tokens:{model}", 0)
+            for model in PRICES
+        },
+        "estimated_cost_usd": cost(requests),
+        "downgraded_calls": sum(
+            row["calls"] for row in metrics["routing"] if row["reason"] != "route"
+        ),
+        "routing": metrics["routing"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="routing_results.json")
+    parser.add_argument("--city", default="Seattle")
+    parser.add_argument("--large-latency", type=float, default=0.4)
+    parser.add_argument("--small-latency", type=float, default=0.15)
+    parser.add_argument("--serper-latency", type=float, default=0.05)
+    parser.add_argument("--page-paragraphs", type=int, default=200)
+    parser.add_argument(
+        "--configuration", choices=sorted(CONFIGURATIONS), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output)
+
+    if args.configuration:
+        with open(output_path, "w") as f:
+            json.dump(run_configuration(args), f)
+        return
+
+    report = {"config": vars(args), "configurations": {}}
+    for name, environment in CONFIGURATIONS.items():
+        # A process per configuration: the tiers are read at import time and
+        # every cache starts empty
+        with tempfile.NamedTemporaryFile(suffix=".json") as result:
+            command = [sys.executable, "-m", "benchmarks.routing_benchmark"]
+            command += sys.argv[1:] + ["--configuration", name, "--output", result.name]
+            subprocess.run(
+                command,
+                env={**os.environ, **environment},
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            with open(result.name) as f:
+                report["configurations"][name] = json.load(f)
+
+    baseline = report["configurations"]["untiered"]
+    for results in report["configurations"].values():
+        results["speedup"] = (
+            baseline["wall_clock_seconds"] / results["wall_clock_seconds"]
+        )
+        results["llm_seconds_ratio"] = results["llm_seconds"] / baseline["llm_seconds"]
+        results["cost_ratio"] = (
+            results["estimated_cost_usd"] / baseline["estimated_cost_usd"]
+            if baseline["estimated_cost_usd"]
+            else 0.0
+        )
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Offline end-to-end benchmarks against local Serper/OpenAI stand-ins.
+
+Starts the stub servers from benchmarks.stub_servers, points the tools and
+the LLM clients at them, then times the individual tools and a full
+NeighborhoodCrew run. Everything runs in a temporary working directory with
+fresh caches, so no network access or API keys are needed:
+
+    python -m benchmarks.run_benchmarks --output bench_results.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def latency_summary(samples):
+    return {
+        "calls": len(samples),
+        "mean_seconds": statistics.fmean(samples) if samples else 0.0,
+        "p50_seconds": percentile(samples, 0.50),
+        "p95_seconds": percentile(samples, 0.95),
+    }
+
+
+def time_calls(fn, inputs):
+    samples = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - started)
+    return latency_summary(samples)
+
+
+def configure_environment(serper, openai, workdir):
+    os.environ.update(
+        {
+            "SERPER_API_KEY": "stub",
+            "OPENAI_API_KEY": "stub",
+            "SERPER_BASE_URL": serper.url,
+            "OPENAI_API_BASE": f"{openai.url}/v1",
+            "SEARCH_CACHE_PATH": os.path.join(workdir, "search_cache.sqlite"),
+            "SCRAPE_CACHE_PATH": os.path.join(workdir, "scrape_cache.sqlite"),
+            "LLM_CACHE_MODE": os.environ.get("LLM_CACHE_MODE", "live"),
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite"),
+            "OTEL_SDK_DISABLED": "true",
+            # The stubs have no rate limits; keep the limiter in the path
+            # without pacing the run to OpenAI's real quotas.
+            "RATE_LIMIT_OPENAI_RPM": "100000",
+            "RATE_LIMIT_OPENAI_TPM": "100000000",
+        }
+    )
+
+
+def write_cost_table(directory, city, neighborhoods):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{city.casefold().replace(' ', '_')}.csv")
+    with open(path, "w") as f:
+        f.write("neighborhood,rent,utilities,groceries\n")
+        for i, name in enumerate(neighborhoods):
+            f.write(f"{name},{1800 + 37 * (i % 40)},{150 + i % 50},{350 + i % 80}\n")
+
+
+def benchmark_tools(serper, iterations):
+    from tools.affordability_tools import AffordabilityTools
+    from tools.browser_tools import BrowserTools
+    from tools.calculator_tools import CalculatorTools
+    from tools.corpus_index import CorpusTools
+    from tools.file_tools import FileTools
+    from tools.search_tools import SearchTools
+
+    FileTools.write_file.run(
+        {"data": "benchmark notes\n" * 200, "relative_path": "bench.txt"}
+    )
+    return {
+        "search_internet_cold": time_calls(
+            SearchTools.search_internet.run,
+            [f"seattle neighborhoods {i}" for i in range(iterations)],
+        ),
+        "search_internet_warm": time_calls(
+            SearchTools.search_internet.run,
+            [f"seattle neighborhoods {i}" for i in range(iterations)],
+        ),
+        "search_news_cold": time_calls(
+            SearchTools.search_news.run,
+            [f"seattle crime news {i}" for i in range(iterations)],
+        ),
+        "scrape_and_summarize_website": time_calls(
+            BrowserTools.scrape_and_summarize_website.run,
+            [
+                {
+                    "website": f"{serper.url}/pages/{i}",
+                    "summeryAndOutputRequirements": "neighborhood scores",
+                }
+                for i in range(max(1, iterations // 4))
+            ],
+        ),
+        # Answered from the results and pages indexed by the calls above
+        "query_local_corpus": time_calls(
+            CorpusTools.query_local_corpus.run,
+            [f"seattle safe walkable parks {i}" for i in range(iterations)],
+        ),
+        "calculate": time_calls(
+            CalculatorTools.calculate.run, ["2700 * 12 / 3"] * iterations
+        ),
+        "analyze_affordability_500": time_calls(
+            AffordabilityTools.analyze_affordability.run,
+            [{"city": "Bench City", "budget": "2000-2700 USD per month"}] * iterations,
+        ),
+        "read_file": time_calls(FileTools.read_file.run, ["bench.txt"] * iterations),
+        "read_file_pattern": time_calls(
+            FileTools.read_file.run,
+            [{"relative_path": "bench.txt", "pattern": "notes"}] * iterations,
+        ),
+    }
+
+
+def benchmark_frontier(serper, callers=4):
+    """Concurrent scrapes of one page (spelled differently) by several agents."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from tools.browser_tools import BrowserTools
+
+    url = f"{serper.url}/pages/{1000 + callers}"
+    spellings = [url, url + "#top", url + "?utm_source=bench", f" {url} "]
+    pages_before = serper.requests["page"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        list(
+            executor.map(
+                lambda website: BrowserTools.scrape_and_summarize_website.run(
+                    {
+                        "website": website,
+                        "summeryAndOutputRequirements": "neighborhood scores",
+                    }
+                ),
+                [spellings[i % len(spellings)] for i in range(callers)],
+            )
+        )
+    return {
+        "callers": callers,
+        "seconds": time.perf_counter() - started,
+        "page_fetches": serper.requests["page"] - pages_before,
+    }
+
+
+def benchmark_scoring(neighborhoods, profiles, dimensions=5):
+    import numpy as np
+
+    from tools.scoring_engine import ScoreTable, rank
+
+    generator = np.random.default_rng(0)
+    table = ScoreTable(
+        range(neighborhoods),
+        [f"dimension_{i}" for i in range(dimensions)],
+        generator.uniform(0, 10, (neighborhoods, dimensions)),
+    )
+    weights = generator.uniform(0.5, 4, (profiles, dimensions))
+    started = time.perf_counter()
+    rank(table, weights)
+    return {
+        "neighborhoods": neighborhoods,
+        "profiles": profiles,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+PREFERENCES = {
+    "budget": "2000-2700 USD per month",
+    "lifestyle": "active",
+    "family": "2 members: 2 adults (working)",
+    "facilities": "parks, gyms, shopping centers",
+    "safety": "high importance, low crime rate preferred",
+}
+
+
+def benchmark_crew(city, mode, preferences=PREFERENCES):
+    """(wall-clock seconds, seconds until the first task result was streamed)."""
+    from main import NeighborhoodCrew
+
+    started = time.perf_counter()
+    first_result = None
+    for event in NeighborhoodCrew(city, preferences).stream(mode=mode):
+        if event.type == "task_finished" and first_result is None:
+            first_result = time.perf_counter() - started
+        elif event.type == "error":
+            raise RuntimeError(event.data["error"])
+    return time.perf_counter() - started, first_result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--serper-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--results", type=int, default=8, help="search results per query"
+    )
+    parser.add_argument("--page-paragraphs", type=int, default=200)
+    parser.add_argument("--completion-words", type=int, default=120)
+    parser.add_argument("--city", default="Seattle")
+    parser.add_argument(
+        "--mode", choices=["parallel", "sequential"], default="parallel"
+    )
+    parser.add_argument("--skip-crew", action="store_true")
+    parser.add_argument("--scoring-neighborhoods", type=int, default=5000)
+    parser.add_argument("--scoring-profiles", type=int, default=200)
+    args = parser.parse_args()
+
+    from benchmarks.stub_servers import NEIGHBORHOODS, OpenAIStub, SerperStub
+
+    output_path = os.path.abspath(args.output)
+
+    serper = SerperStub(
+        results=args.results,
+        page_paragraphs=args.page_paragraphs,
+        latency=args.serper_latency,
+    ).start()
+    openai = OpenAIStub(
+        completion_words=args.completion_words, latency=args.llm_latency
+    ).start()
+    try:
+        workdir = tempfile.mkdtemp(prefix="neighborhood-bench-")
+        os.chdir(workdir)
+        configure_environment(serper, openai, workdir)
+        costs_directory = os.path.join(workdir, "workdir", "cost_of_living")
+        write_cost_table(costs_directory, args.city, NEIGHBORHOODS)
+        write_cost_table(
+            costs_directory, "Bench City", [f"Neighborhood {i}" for i in range(500)]
+        )
+
+        report = {
+            "config": vars(args),
+            "tools": benchmark_tools(serper, args.iterations),
+        }
+        report["frontier"] = benchmark_frontier(serper)
+        report["scoring"] = benchmark_scoring(
+            args.scoring_neighborhoods, args.scoring_profiles
+        )
+        tool_llm_calls = openai.requests["chat"]
+        if not args.skip_crew:
+            wall_clock, first_result = benchmark_crew(args.city, args.mode)
+            report["crew"] = {
+                "mode": args.mode,
+                "wall_clock_seconds": wall_clock,
+                "first_result_seconds": first_result,
+                "llm_calls": openai.requests["chat"] - tool_llm_calls,
+            }
+            # Same city with only the budget edited: the other tasks' outputs
+            # are reused, then the knowledge store serves the first run's cells
+            edited = dict(PREFERENCES, budget="3000-3500 USD per month")
+            cold_llm_calls = openai.requests["chat"]
+            report["crew"]["edited_wall_clock_seconds"], _ = benchmark_crew(
+                args.city, args.mode, edited
+            )
+            report["crew"]["edited_llm_calls"] = (
+                openai.requests["chat"] - cold_llm_calls
+            )
+
+        from tools.http_client import get_http_client
+        from tools.rate_limiter import rate_limit_summary
+        from tools.search_tools import search_cache
+        from tools.url_frontier import url_frontier
+
+        report["http"] = get_http_client().metrics_summary()
+        report["search_cache"] = search_cache.stats()
+        report["rate_limits"] = rate_limit_summary()
+        report["url_frontier"] = url_frontier.summary()
+        report["serper_requests"] = {
+            route: serper.requests[route] for route in ("/search", "/news", "page")
+        }
+        report["llm"] = {
+            "calls": openai.requests["chat"],
+            "prompt_tokens": openai.requests["prompt_tokens"],
+            "completion_tokens": openai.requests["completion_tokens"],
+        }
+        # ru_maxrss is reported in kilobytes on Linux.
+        report["peak_rss_mb"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        )
+    finally:
+        serper.stop()
+        openai.stop()
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
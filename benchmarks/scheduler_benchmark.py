@@ -0,0 +1,90 @@
+"""Compare sequential task execution with the TaskScheduler.
+
+The default run simulates the five research tasks of NeighborhoodCrew with
+sleeps of realistic relative length, so it needs no API keys:
+
+    python -m benchmarks.scheduler_benchmark
+
+Pass --city to time a real NeighborhoodCrew in both modes instead.
+"""
+
+import argparse
+import json
+import time
+from functools import partial
+
+from tasks.taskScheduler import TaskScheduler
+
+# Relative durations of the research tasks, in seconds of simulated work.
+SIMULATED_TASKS = {
+    "safety": 1.2,
+    "amenities": 0.9,
+    "budget": 0.4,
+    "lifestyle": 0.5,
+    "reviews": 1.0,
+}
+
+
+def _simulated_task(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def run_sequential(durations):
+    started = time.perf_counter()
+    for seconds in durations.values():
+        _simulated_task(seconds)
+    return time.perf_counter() - started
+
+
+def run_scheduled(durations, max_concurrency):
+    scheduler = TaskScheduler(max_concurrency=max_concurrency)
+    names = [
+        scheduler.add(name, partial(_simulated_task, seconds))
+        for name, seconds in durations.items()
+    ]
+    scheduler.add(
+        "aggregate", lambda **outputs: sum(outputs.values()), depends_on=names
+    )
+    started = time.perf_counter()
+    scheduler.run()
+    return time.perf_counter() - started
+
+
+def run_crew(city, mode):
+    from main import NeighborhoodCrew
+
+    preferences = {
+        "budget": "2000-2700 USD per month",
+        "lifestyle": "active",
+        "facilities": "parks, gyms, shopping centers",
+        "safety": "high importance, low crime rate preferred",
+    }
+    started = time.perf_counter()
+    NeighborhoodCrew(city, preferences).run(mode=mode)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-concurrency", type=int, default=5)
+    parser.add_argument("--city", help="time a live NeighborhoodCrew for this city")
+    args = parser.parse_args()
+
+    if args.city:
+        report = {
+            "sequential_seconds": run_crew(args.city, "sequential"),
+            "parallel_seconds": run_crew(args.city, "parallel"),
+        }
+    else:
+        report = {
+            "slowest_task_seconds": max(SIMULATED_TASKS.values()),
+            "sequential_seconds": run_sequential(SIMULATED_TASKS),
+            "parallel_seconds": run_scheduled(SIMULATED_TASKS, args.max_concurrency),
+        }
+    report["speedup"] = report["sequential_seconds"] / report["parallel_seconds"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
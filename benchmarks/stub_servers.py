@@ -0,0 +1,262 @@
+"""Local stand-ins for the Serper and OpenAI APIs.
+
+SerperStub answers POST /search and /news with Serper-shaped JSON and
+serves GET /pages/<n> as HTML city-guide pages, so the search results link
+to pages that ScrapeWebsiteTool can fetch. OpenAIStub answers POST
+/v1/chat/completions in the ReAct format crewai agents expect: an agent that
+has the search tool first searches, then scrapes the first link it was
+given if it has the scrape tool, then gives a final answer. An agent with
+the affordability tool calls it once before answering.
+
+Both stubs sleep for a configurable latency (plus jitter) per request and
+count requests and tokens, so benchmarks can run with no network. OpenAIStub
+can give each model its own latency and also counts calls and tokens per
+model, under "chat:<model>", "prompt_tokens:<model>" and so on.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools.text_chunker import count_tokens
+
+NEIGHBORHOODS = [
+    "Capitol Hill",
+    "Ballard",
+    "Fremont",
+    "Queen Anne",
+    "Wallingford",
+    "Green Lake",
+    "Columbia City",
+    "West Seattle",
+]
+
+
+class _StubServer:
+    def __init__(self, latency=0.05, jitter=0.02):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _sleep(self, latency=None):
+        latency = self.latency if latency is None else latency
+        time.sleep(max(0.0, latency + random.uniform(-self.jitter, self.jitter)))
+
+    def _count(self, route, **counters):
+        with self._lock:
+            self.requests[route] += 1
+            for name, value in counters.items():
+                self.requests[name] += value
+
+    def handle(self, method, path, body):
+        raise NotImplementedError
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, content_type, payload = stub.handle(method, self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SerperStub(_StubServer):
+    def __init__(self, results=8, snippet_words=40, page_paragraphs=60, **kwargs):
+        super().__init__(**kwargs)
+        self.results = results
+        self.snippet_words = snippet_words
+        self.page_paragraphs = page_paragraphs
+
+    def _results(self, query, kind):
+        results = []
+        for i in range(self.results):
+            neighborhood = NEIGHBORHOODS[i % len(NEIGHBORHOODS)]
+            results.append(
+                {
+                    "title": f"{neighborhood} {kind} guide: {query}",
+                    "link": f"{self.url}/pages/{i}",
+                    "snippet": " ".join(
+                        f"{neighborhood.lower()} is safe walkable and close to parks"
+                        for _ in range(max(1, self.snippet_words // 8))
+                    ),
+                }
+            )
+        return results
+
+    def _page(self, number):
+        neighborhood = NEIGHBORHOODS[number % len(NEIGHBORHOODS)]
+        menu = "".join(f"<li><a href='#'>{name}</a></li>" for name in NEIGHBORHOODS)
+        paragraphs = "".join(
+            f"<p>{neighborhood} paragraph {i}: median rent is {1800 + 25 * i} USD, "
+            f"crime is {'below' if i % 2 else 'near'} the city average and there are "
+            f"{i % 7 + 1} parks within walking distance.</p>"
+            for i in range(self.page_paragraphs)
+        )
+        return (
+            f"<html><body><nav><ul>{menu}</ul></nav><h1>{neighborhood}</h1>"
+            f"{paragraphs}<footer>We use cookies. All rights reserved.</footer>"
+            "</body></html>"
+        )
+
+    def handle(self, method, path, body):
+        self._sleep()
+        if method == "GET" and path.startswith("/pages/"):
+            self._count("page")
+            number = int(path.rsplit("/", 1)[-1] or 0)
+            return 200, "text/html", self._page(number).encode("utf-8")
+        if method == "POST" and path in ("/search", "/news"):
+            self._count(path)
+            query = json.loads(body or b"{}").get("q", "")
+            key = "organic" if path == "/search" else "news"
+            payload = {key: self._results(query, key)}
+            return 200, "application/json", json.dumps(payload).encode("utf-8")
+        return 404, "application/json", b'{"error": "not found"}'
+
+
+class OpenAIStub(_StubServer):
+    def __init__(self, completion_words=120, model_latency=None, **kwargs):
+        super().__init__(**kwargs)
+        self.completion_words = completion_words
+        self.model_latency = model_latency or {}
+
+    def _final_answer(self):
+        words_per_record = max(1, self.completion_words // len(NEIGHBORHOODS))
+        lines = [
+            json.dumps(
+                {
+                    "neighborhood": name,
+                    "score": 7 + i % 3,
+                    "sources": [f"{self.url}/pages/{i}"],
+                    "summary": " ".join(
+                        ["stub evaluation"] + ["detail"] * words_per_record
+                    ),
+                }
+            )
+            for i, name in enumerate(NEIGHBORHOODS)
+        ]
+        answer = "\n".join(lines)
+        return f"Thought: I now can give a great answer\nFinal Answer:\n{answer}"
+
+    def _reply(self, prompt):
+        # The tool instructions mention "Observation:" too; only count the
+        # ones after the task starts.
+        observations = prompt.split("Begin!")[-1].count("Observation:")
+        has_search = "Search the internet" in prompt and "Action:" in prompt
+        has_scrape = "Scrape the website and summarize the content" in prompt
+        if has_search and observations == 0:
+            city = re.search(r"City: ([^\n]+)", prompt)
+            query = f"{city.group(1).strip() if city else 'city'} neighborhoods"
+            return (
+                "Thought: I should search for data first\n"
+                "Action: Search the internet\n"
+                f'Action Input: {{"query": "{query}"}}'
+            )
+        if "Analyze neighborhood affordability" in prompt and observations == 0:
+            city = re.search(r"City: ([^\n]+)", prompt)
+            budget = re.search(r"user's budget: ([^\n]+?)\.?\n", prompt)
+            arguments = {
+                "city": city.group(1).strip() if city else "city",
+                "budget": budget.group(1) if budget else "2500",
+            }
+            return (
+                "Thought: I should score affordability from the local cost data\n"
+                "Action: Analyze neighborhood affordability\n"
+                f"Action Input: {json.dumps(arguments)}"
+            )
+        link = re.search(r"Link: (\S+)", prompt)
+        if has_scrape and observations == 1 and link:
+            return (
+                "Thought: I should read the top result\n"
+                "Action: Scrape the website and summarize the content\n"
+                f'Action Input: {{"website": "{link.group(1)}", '
+                '"summeryAndOutputRequirements": "neighborhood scores"}'
+            )
+        return self._final_answer()
+
+    def handle(self, method, path, body):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            self._sleep()
+            return 404, "application/json", b'{"error": "not found"}'
+        request = json.loads(body or b"{}")
+        model = request.get("model", "stub")
+        self._sleep(self.model_latency.get(model))
+        prompt = "\n".join(
+            message.get("content") or "" for message in request.get("messages", [])
+        )
+        content = self._reply(prompt)
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        self._count(
+            "chat",
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            **{
+                f"chat:{model}": 1,
+                f"prompt_tokens:{model}": prompt_tokens,
+                f"completion_tokens:{model}": completion_tokens,
+            },
+        )
+        payload = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        return 200, "application/json", json.dumps(payload).encode("utf-8")
@@ -1,96 +1,464 @@
+import argparse
+import asyncio
+import contextvars
+import json
 import os
+import sys
+import threading
+from functools import partial
 from textwrap import dedent
 
-from crewai import Crew
 from dotenv import load_dotenv
 
-from agents.neighborhoodAgents import NeighborhoodAgents
-from tasks.neighborhoodTasks import NeighborhoodTasks
+from tasks.taskScheduler import TaskScheduler
+from tools.single_flight import SingleFlight
 
 load_dotenv()
 
+# crewai, LangChain and the tools are imported inside the functions that run
+# a crew, so --help, --check-config and batch shards start quickly.
+# Mirrors agents.llmCache.LLMCacheMode, which would pull in LangChain.
+LLM_CACHE_MODES = ("live", "record", "replay")
 
-def prepare():
-    required_vars = ["SERPER_API_KEY", "OPENAI_API_KEY"]
+# Research tasks in flight across every crew of the process, keyed by their
+# input fingerprint: crews evaluating the same city share one run of a task.
+research_flights = SingleFlight()
+
+
+def check_environment():
+    """Validate the environment and return the LLM cache mode."""
+    llm_cache_mode = os.environ.get("LLM_CACHE_MODE", "live")
+    if llm_cache_mode not in LLM_CACHE_MODES:
+        raise EnvironmentError(
+            f"LLM_CACHE_MODE must be one of {', '.join(LLM_CACHE_MODES)}, "
+            f"got '{llm_cache_mode}'"
+        )
+    try:
+        from agents.modelRouter import required_api_keys
+
+        api_keys = required_api_keys()
+    except ValueError as e:
+        # MODEL_ROUTES or a MODEL_TIER_* variable that cannot be parsed
+        raise EnvironmentError(str(e)) from e
+    required_vars = ["SERPER_API_KEY"]
+    if llm_cache_mode == "replay":
+        # Replayed runs never reach the model APIs, but the clients still
+        # insist on a key at construction time.
+        for var in api_keys:
+            os.environ.setdefault(var, "replay")
+    else:
+        required_vars.extend(api_keys)
     missing_vars = [var for var in required_vars if var not in os.environ]
     if missing_vars:
         raise EnvironmentError(
             f"Missing required environment variables: {', '.join(missing_vars)}"
         )
+    return llm_cache_mode
+
+
+def prepare():
+    from agents.llmCache import configure_llm_cache
+
+    llm_cache_mode = check_environment()
 
     if not os.path.exists("./workdir"):
         os.mkdir("./workdir")
 
+    configure_llm_cache(llm_cache_mode)
+
+
+def run_task(name, agent, task):
+    """Run one task in its own crew and return its validated records."""
+    from crewai import Crew
+
+    from tasks.taskOutputs import validated_records
+    from tools.run_events import check_cancelled, emit
+    from tools.run_metrics import metrics_scope
+
+    # A consumer that stopped listening to the run's events cancels the
+    # tasks that have not started yet
+    check_cancelled()
+    with metrics_scope(agent.role, name):
+        emit("task_started", agent.role, name)
+        crew = Crew(agents=[agent], tasks=[task], verbose=True)
+        return validated_records(task, crew.kickoff())
+
+
+def narrate_ranking(ranking_text, user_preferences):
+    from agents.modelRouter import routed_llm
+    from tools.run_metrics import metrics_scope
+
+    prompt = dedent("""
+        Write a short recommendation (at most 150 words) for someone choosing
+        a neighborhood, based only on this ranking. Do not change the order
+        or the scores.
+        Ranking:
+        {ranking}
+        Preferences: {preferences}
+    """).format(ranking=ranking_text, preferences=user_preferences)
+    with metrics_scope("Neighborhood Research Manager", "narrative"):
+        return routed_llm("narrative").invoke(prompt).content
+
+
+def aggregate_results(user_preferences, narrative=False, **outputs):
+    """Rank the neighborhoods from every task's records with the scoring engine.
+
+    The ranking is computed locally; the LLM is only asked for the optional
+    narrative.
+    """
+    from tools.scoring_engine import ScoreTable, format_ranking, ranking
+
+    table = ScoreTable.from_records(outputs)
+    ranking_text = format_ranking(ranking(table, user_preferences))
+    sections = [f"## Ranking\n{ranking_text}"]
+    if narrative:
+        sections.append(
+            f"## Summary\n{narrate_ranking(ranking_text, user_preferences)}"
+        )
+    sections.extend(
+        f"## {name}\n"
+        + "\n".join(
+            f"- {record.neighborhood}: {record.score:g}/10. {record.summary}"
+            for record in records
+        )
+        for name, records in outputs.items()
+    )
+    return "\n\n".join(sections)
+
+
+def render_event(event):
+    """One line of live CLI output for a RunEvent, or None to print nothing."""
+    data = event.data
+    if event.type == "task_started":
+        return f">> {event.task} started ({event.agent})"
+    if event.type == "tool_call":
+        status = "ok" if data["ok"] else "failed"
+        return f"   {event.agent}: {data['tool']} {status} in {data['seconds']:.1f}s"
+    if event.type == "neighborhood_score":
+        return f"   {event.task}: {data['neighborhood']} {data['score']:g}/10"
+    if event.type == "task_finished":
+        return f"<< {event.task} finished with {data['records']} neighborhoods"
+    if event.type == "ranking":
+        leaders = ", ".join(
+            f"{row['neighborhood']} {row['score']:.1f}" for row in data["rows"]
+        )
+        return f"   Ranking so far ({', '.join(data['tasks'])}): {leaders}"
+    return None
+
 
 class NeighborhoodCrew:
-    def __init__(self, city, user_preferences):
+    def __init__(
+        self, city, user_preferences, output_dir=None, narrative=False, refresh=False
+    ):
         self.city = city
         self.user_preferences = user_preferences
+        self.output_dir = output_dir
+        self.narrative = narrative
+        self.refresh = refresh
+        self.store = None
+
+    def run(self, mode="parallel"):
+        """Run the evaluation.
+
+        In "parallel" mode the independent research tasks run concurrently,
+        each in its own single-agent crew, and their outputs are ranked by
+        the scoring engine once all of them finish. "sequential" runs one
+        Crew over every task.
+
+        A task whose city and preference fields are unchanged since an
+        earlier run reuses that run's output, so editing one preference only
+        re-runs the tasks that read it. Otherwise results already in the
+        knowledge store for the same preference fields are reused: a task
+        only researches the neighborhoods whose stored results are missing or
+        stale, and is skipped when none are. refresh=True researches
+        everything again.
+
+        Each task's answer is validated as NeighborhoodRecord JSON Lines and
+        written to its output file. Token, latency and call counts are
+        written to run_metrics.json next to the task output files. Use
+        stream() or astream() to follow the run as it happens.
+        """
+        from tools.corpus_index import corpus_scope
+        from tools.run_metrics import RUN_METRICS_FILE, collect_metrics
 
-    def run(self):
         prepare()
-        agents = NeighborhoodAgents()
-        tasks = NeighborhoodTasks()
-
-        # Initialize agents
-        research_manager_agent = agents.neighborhood_research_manager()
-        safety_agent = agents.safety_research_agent()
-        lifestyle_agent = agents.lifestyle_preferences_agent()
-        budget_agent = agents.budget_and_affordability_agent()
-        amenities_agent = agents.amenities_evaluation_agent()
-        schools_agent = agents.schools_and_education_agent(user_preferences)
-        parks_agent = agents.parks_and_recreation_agent()
-        transport_agent = agents.public_transport_agent()
-        food_agent = agents.food_and_drink_agent()
-        reviews_agent = agents.reviews_and_descriptions_agent()
-        reviews_search_agent = agents.reviews_search_agent()
-
-        safety_task = tasks.safety_analysis_task(
-            safety_agent, self.city, self.user_preferences
-        )
-        amenities_task = tasks.amenities_evaluation_task(
-            amenities_agent, self.city, self.user_preferences
+        with collect_metrics() as metrics, corpus_scope(self.city):
+            result = self._run(mode)
+        metrics.write_report(os.path.join(self.output_dir or ".", RUN_METRICS_FILE))
+        print(metrics.console_summary())
+        return result
+
+    def stream(self, mode="parallel"):
+        """Run the evaluation in the background and yield RunEvents as they happen.
+
+        Events are "task_started", "tool_call", one "neighborhood_score" per
+        record and an interim "ranking" as each task finishes,
+        "task_finished", and finally "finished" (data["result"]) or "error".
+        Closing the generator early stops tasks that have not started yet;
+        tasks already running finish in the background. In "sequential" mode
+        task results arrive when the whole crew is done.
+        """
+        events = self._start_stream(mode)
+        try:
+            yield from events
+        finally:
+            events.close()
+
+    def _start_stream(self, mode):
+        """Start the run in a background thread and return its EventStream."""
+        from tools.run_events import EventStream, RunCancelled, emit, publish_events
+
+        events = EventStream()
+
+        def produce():
+            with publish_events(events):
+                try:
+                    emit("finished", result=self.run(mode))
+                except RunCancelled:
+                    pass
+                except Exception as e:
+                    emit("error", error=f"{type(e).__name__}: {e}")
+                finally:
+                    events.end()
+
+        producer = threading.Thread(
+            target=contextvars.copy_context().run, args=(produce,), daemon=True
         )
-        budget_task = tasks.budget_analysis_task(
-            budget_agent, self.city, self.user_preferences
+        producer.start()
+        return events
+
+    async def astream(self, mode="parallel"):
+        """stream() as an async iterator, for use from an event loop."""
+        loop = asyncio.get_running_loop()
+        events = self._start_stream(mode)
+        iterator = iter(events)
+        done = object()
+        try:
+            while True:
+                event = await loop.run_in_executor(None, next, iterator, done)
+                if event is done:
+                    return
+                yield event
+        finally:
+            # Closing the EventStream itself works even while an executor
+            # thread is still waiting inside next()
+            events.close()
+
+    def _fingerprint(self, name):
+        from tasks.neighborhoodTasks import preference_fields
+        from tasks.taskOutputs import input_fingerprint
+
+        return input_fingerprint(
+            name, self.city, self.user_preferences, preference_fields(name)
         )
-        lifestyle_task = tasks.lifestyle_matching_task(
-            lifestyle_agent, self.city, self.user_preferences
+
+    def _store_preferences(self, name):
+        """The preference fields a task reads, as the knowledge store keys its cells."""
+        from tasks.neighborhoodTasks import preference_fields
+
+        fields = preference_fields(name)
+        if not fields:
+            return ""
+        return json.dumps(
+            {field: self.user_preferences.get(field) for field in fields},
+            sort_keys=True,
         )
-        reviews_task = tasks.search_and_summarize_reviews_task(
-            reviews_search_agent, self.city, self.user_preferences
+
+    def _finish(self, name, path, stored, records):
+        """Store newly researched records and write them, with the reused ones, to path.
+
+        records is None when the task's output could not be validated; only
+        the stored records are then used, and nothing is saved for reuse.
+        """
+        from tasks.taskOutputs import cache_records, merge_records, write_records
+        from tools.corpus_index import corpus_index
+
+        failed = records is None
+        if not failed:
+            self.store.put(self.city, name, records, self._store_preferences(name))
+        records = merge_records(stored, records or [])
+        corpus_index.tag_neighborhoods(
+            self.city, [record.neighborhood for record in records]
         )
+        if not failed:
+            cache_records(self._fingerprint(name), records)
+        write_records(path, records)
+        self._publish(name, records)
+        return records
+
+    def _publish(self, name, records):
+        """Emit a finished task's scores and the ranking of the finished tasks."""
+        from tools.run_events import emit, publishing
+        from tools.scoring_engine import ScoreTable, ranking
 
-        # Create a single crew with all agents and tasks
-        crew = Crew(
-            agents=[
-                research_manager_agent,
-                safety_agent,
-                lifestyle_agent,
-                budget_agent,
-                amenities_agent,
-                schools_agent,
-                parks_agent,
-                transport_agent,
-                food_agent,
-                reviews_agent,
-                reviews_search_agent,
-            ],
-            tasks=[
-                safety_task,
-                amenities_task,
-                budget_task,
-                lifestyle_task,
-                reviews_task,
-            ],
-            verbose=True,
+        if not publishing():
+            return
+        for record in records:
+            emit(
+                "neighborhood_score",
+                task=name,
+                neighborhood=record.neighborhood,
+                score=record.score,
+                summary=record.summary,
+            )
+        emit("task_finished", task=name, records=len(records))
+        with self._partial_lock:
+            self._partial[name] = records
+            table = ScoreTable.from_records(dict(self._partial))
+        emit(
+            "ranking",
+            tasks=sorted(table.dimensions),
+            rows=ranking(table, self.user_preferences, top=5),
         )
 
-        result = crew.kickoff()
-        return result
+    def _research(self, name, task, path, stored):
+        from tasks.taskOutputs import cached_records
+        from tools.run_events import RunCancelled, check_cancelled
+
+        fingerprint = self._fingerprint(name)
+
+        def research():
+            # Another crew may have finished the same research while this
+            # one waited for a task slot.
+            previous = None if self.refresh else cached_records(fingerprint)
+            if previous is not None:
+                return previous
+            return run_task(name, task.agent, task)
+
+        try:
+            records = research_flights.do(fingerprint, research)
+        except RunCancelled:
+            # The crew that was running this task lost its consumer; run it
+            # here unless this crew was cancelled too.
+            check_cancelled()
+            records = research_flights.do(fingerprint, research)
+        return self._finish(name, path, stored, records)
+
+    def _run(self, mode):
+        from crewai import Crew, Task
+
+        from agents.agentRegistry import AgentRegistry
+        from tasks.neighborhoodTasks import RESEARCH_TASKS, NeighborhoodTasks
+        from tasks.taskOutputs import cached_records, validated_records
+        from tools.knowledge_store import KnowledgeStore
+        from tools.run_events import emit
+        from tools.run_metrics import metrics_scope
+
+        registry = AgentRegistry(self.user_preferences)
+        tasks = NeighborhoodTasks(self.output_dir)
+        self.store = self.store or KnowledgeStore()
+        self._partial, self._partial_lock = {}, threading.Lock()
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        known = [] if self.refresh else self.store.neighborhoods(self.city)
+        research, reused = {}, {}
+        for name, (agent_name, task_name, output_file) in RESEARCH_TASKS.items():
+            path = tasks.output_path(output_file)
+            # Outputs of an earlier run whose city and preference fields match
+            previous = None if self.refresh else cached_records(self._fingerprint(name))
+            if previous is not None:
+                reused[name] = (path, previous)
+                continue
+            stored, stale = [], None
+            if known and self.store.tracks(name):
+                stored, stale = self.store.lookup(
+                    self.city, name, known, self._store_preferences(name)
+                )
+                if stored and not stale:
+                    reused[name] = (path, stored)
+                    continue
+            # Only agents that a research task asks for are ever built
+            task = getattr(tasks, task_name)(
+                registry.get(agent_name),
+                self.city,
+                self.user_preferences,
+                neighborhoods=stale if stored else None,
+            )
+            # lifestyle_matching_task returns a plain string when skipped
+            if isinstance(task, Task):
+                research[name] = (task, path, stored)
+
+        if mode == "parallel":
+            scheduler = TaskScheduler()
+            names = [
+                scheduler.add(name, partial(self._research, name, task, path, stored))
+                for name, (task, path, stored) in research.items()
+            ] + [
+                scheduler.add(name, partial(self._finish, name, path, stored, []))
+                for name, (path, stored) in reused.items()
+            ]
+            scheduler.add(
+                "aggregate",
+                partial(aggregate_results, self.user_preferences, self.narrative),
+                depends_on=names,
+            )
+            return scheduler.run()["aggregate"]
+
+        outputs = {
+            name: self._finish(name, path, stored, [])
+            for name, (path, stored) in reused.items()
+        }
+        if research:
+            # Create a single crew with the agents and tasks in use
+            crew = Crew(
+                agents=[task.agent for task, _, _ in research.values()],
+                tasks=[task for task, _, _ in research.values()],
+                verbose=True,
+            )
+
+            # A single crew runs every agent, so calls can only be attributed
+            # to the crew as a whole.
+            with metrics_scope("Neighborhood Crew", "sequential"):
+                for name, (task, _, _) in research.items():
+                    emit("task_started", task.agent.role, name)
+                crew.kickoff()
+                for name, (task, path, stored) in research.items():
+                    records = validated_records(task, task.output.raw_output)
+                    outputs[name] = self._finish(name, path, stored, records)
+        return aggregate_results(self.user_preferences, self.narrative, **outputs)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neighborhood Evaluation Crew")
+    parser.add_argument(
+        "--mode",
+        choices=["parallel", "sequential"],
+        default="parallel",
+        help="run independent tasks concurrently or in one sequential crew",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=LLM_CACHE_MODES,
+        help="live: always call the LLM; record: reuse and save completions; "
+        "replay: serve completions only from the cache",
+    )
+    parser.add_argument(
+        "--narrative",
+        action="store_true",
+        help="ask the LLM for a short written summary of the computed ranking",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="research everything again instead of reusing earlier results",
+    )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="validate the environment and exit without running a crew",
+    )
+    args = parser.parse_args()
+    if args.llm_cache:
+        os.environ["LLM_CACHE_MODE"] = args.llm_cache
+    if args.check_config:
+        try:
+            mode = check_environment()
+        except EnvironmentError as e:
+            sys.exit(f"Configuration error: {e}")
+        print(f"Configuration OK (LLM cache mode: {mode})")
+        sys.exit(0)
+
     print("## Welcome to Neighborhood Evaluation Crew")
     print("------------------------------------------")
     city = input(
@@ -177,8 +545,18 @@ if __name__ == "__main__":
     #     """)
     # )
 
-    neighborhood_crew = NeighborhoodCrew(city, user_preferences)
-    result = neighborhood_crew.run()
+    neighborhood_crew = NeighborhoodCrew(
+        city, user_preferences, narrative=args.narrative, refresh=args.refresh
+    )
+    result = None
+    for event in neighborhood_crew.stream(mode=args.mode):
+        line = render_event(event)
+        if line:
+            print(line, flush=True)
+        if event.type == "finished":
+            result = event.data["result"]
+        elif event.type == "error":
+            sys.exit(f"Evaluation failed: {event.data['error']}")
     print("\n\n########################")
     print("## Here is your Neighborhood Evaluation")
     print("########################\n")
@@ -0,0 +1,264 @@
+"""Local HTTP service running NeighborhoodCrew evaluations as background jobs.
+
+    python server.py --port 8080 --workers 2
+
+    POST /evaluations       {"city": "Seattle", "preferences": {...},
+                             "mode": "parallel"}
+                            -> 202 {"id": "...", "status": "queued", ...}
+    GET  /evaluations/<id>  -> job status, finished tasks, the latest ranking
+                               and, once done, the result
+    GET  /health            -> worker and job counts
+
+Jobs run on a bounded thread pool. A request identical to a job still
+queued or running (same city, preferences and mode) attaches to that job,
+and crews evaluating the same city share each research task whose inputs
+match (see main.research_flights), so concurrent users asking about one
+city do not start identical crews.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "2"))
+SERVER_MAX_JOBS = int(os.environ.get("SERVER_MAX_JOBS", "1000"))
+MAX_BODY_BYTES = 1024 * 1024
+OUTPUT_ROOT = os.path.join("workdir", "server")
+# Preference fields the task prompts read unconditionally
+REQUIRED_PREFERENCES = ("budget", "facilities", "safety")
+
+
+def job_key(city, preferences, mode):
+    key = json.dumps(
+        [" ".join(city.split()).casefold(), preferences, mode], sort_keys=True
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class Job:
+    def __init__(self, key, city, preferences, mode):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.city = city
+        self.preferences = preferences
+        self.mode = mode
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.finished_tasks = []
+        self.ranking = []
+        self.result = None
+        self.error = None
+        self.requests = 1
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "city": self.city,
+            "mode": self.mode,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "requests": self.requests,
+            "finished_tasks": list(self.finished_tasks),
+            "ranking": self.ranking,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class EvaluationServer:
+    def __init__(self, workers=SERVER_WORKERS, max_jobs=SERVER_MAX_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, city, preferences, mode):
+        """Queue an evaluation, or attach to an identical one not yet finished."""
+        key = job_key(city, preferences, mode)
+        with self._lock:
+            job = self.jobs.get(self.active.get(key))
+            if job is not None:
+                job.requests += 1
+                return job, False
+            job = Job(key, city, preferences, mode)
+            self.jobs[job.id] = job
+            self.active[key] = job.id
+            self._evict()
+        self.executor.submit(self._run, job)
+        return job, True
+
+    def _evict(self):
+        # Forget the oldest finished jobs beyond max_jobs
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                return
+            if self.jobs[job_id].status in ("done", "failed"):
+                del self.jobs[job_id]
+
+    def _run(self, job):
+        from main import NeighborhoodCrew
+
+        job.status, job.started = "running", time.time()
+        crew = NeighborhoodCrew(
+            job.city, job.preferences, output_dir=os.path.join(OUTPUT_ROOT, job.id)
+        )
+        try:
+            for event in crew.stream(mode=job.mode):
+                if event.type == "task_finished":
+                    job.finished_tasks.append(event.task)
+                elif event.type == "ranking":
+                    job.ranking = event.data["rows"]
+                elif event.type == "finished":
+                    job.result = str(event.data["result"])
+                elif event.type == "error":
+                    job.error = event.data["error"]
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.status = "failed" if job.error else "done"
+            job.finished = time.time()
+            self.active.pop(job.key, None)
+
+    def route(self, method, path, body):
+        """(status, payload) for one request."""
+        path = path.split("?", 1)[0].rstrip("/")
+        if method == "GET" and path == "/health":
+            with self._lock:
+                statuses = [job.status for job in self.jobs.values()]
+            return HTTPStatus.OK, {
+                "workers": self.workers,
+                "queued": statuses.count("queued"),
+                "running": statuses.count("running"),
+                "jobs": len(statuses),
+            }
+        if method == "POST" and path == "/evaluations":
+            from tools.scoring_engine import explicit_weight
+
+            try:
+                request = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                return HTTPStatus.BAD_REQUEST, {"error": f"invalid JSON: {e}"}
+            if not isinstance(request, dict):
+                return HTTPStatus.BAD_REQUEST, {"error": "expected a JSON object"}
+            city = request.get("city")
+            preferences = request.get("preferences", {})
+            mode = request.get("mode", "parallel")
+            if not isinstance(city, str) or not city.strip():
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "'city' must be a non-empty string"
+                }
+            if not isinstance(preferences, dict):
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "'preferences' must be an object"
+                }
+            missing = [
+                field for field in REQUIRED_PREFERENCES if field not in preferences
+            ]
+            if missing:
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": f"'preferences' is missing {', '.join(missing)}"
+                }
+            weights = preferences.get("weights", {})
+            if not isinstance(weights, dict) or any(
+                explicit_weight(value) is None for value in weights.values()
+            ):
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "'preferences.weights' must map dimensions to numbers"
+                }
+            if mode not in ("parallel", "sequential"):
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "'mode' must be parallel or sequential"
+                }
+            job, created = self.submit(city.strip(), preferences, mode)
+            return HTTPStatus.ACCEPTED, {**job.as_dict(), "attached": not created}
+        if method == "GET" and path.startswith("/evaluations/"):
+            job = self.jobs.get(path[len("/evaluations/") :])
+            if job is None:
+                return HTTPStatus.NOT_FOUND, {"error": "unknown evaluation"}
+            return HTTPStatus.OK, job.as_dict()
+        return HTTPStatus.NOT_FOUND, {"error": "not found"}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                status, payload = (
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    {"error": "body too large"},
+                )
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self.route(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = HTTPStatus.BAD_REQUEST, {"error": "malformed request"}
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers", type=int, default=SERVER_WORKERS, help="evaluations run at once"
+    )
+    args = parser.parse_args()
+
+    from main import prepare
+
+    prepare()
+    print(
+        f"Serving evaluations on http://{args.host}:{args.port} "
+        f"with {args.workers} workers"
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(EvaluationServer(workers=args.workers).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
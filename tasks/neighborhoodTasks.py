@@ -1,112 +1,169 @@
+import os
 from enum import Enum
 from textwrap import dedent
 
 from crewai import Task
 
+from tasks.taskOutputs import record_format
+from tools.affordability_tools import AffordabilityTools
 from tools.browser_tools import BrowserTools
 from tools.calculator_tools import CalculatorTools
+from tools.corpus_index import CorpusTools
 from tools.file_tools import FileTools
 from tools.search_tools import SearchTools
 
 
 class OutputFilePaths(Enum):
-    SAFETY_ANALYSIS = "safety_analysis.json"
-    USER_PROFILE = "user_profile.json"
-    AMENITIES_EVALUATION = "amenities_evaluation.json"
-    BUDGET_ANALYSIS = "budget_analysis.json"
-    LIFESTYLE_MATCHING = "lifestyle_matching.json"
-    REVIEWS_COLLECTION = "reviews_collection.json"
+    SAFETY_ANALYSIS = "safety_analysis.jsonl"
+    USER_PROFILE = "user_profile.jsonl"
+    AMENITIES_EVALUATION = "amenities_evaluation.jsonl"
+    BUDGET_ANALYSIS = "budget_analysis.jsonl"
+    LIFESTYLE_MATCHING = "lifestyle_matching.jsonl"
+    REVIEWS_COLLECTION = "reviews_collection.jsonl"
+
+
+# Research tasks of an evaluation:
+# name -> (NeighborhoodAgents factory, NeighborhoodTasks factory, output file)
+RESEARCH_TASKS = {
+    "safety": (
+        "safety_research_agent",
+        "safety_analysis_task",
+        OutputFilePaths.SAFETY_ANALYSIS,
+    ),
+    "amenities": (
+        "amenities_evaluation_agent",
+        "amenities_evaluation_task",
+        OutputFilePaths.AMENITIES_EVALUATION,
+    ),
+    "budget": (
+        "budget_and_affordability_agent",
+        "budget_analysis_task",
+        OutputFilePaths.BUDGET_ANALYSIS,
+    ),
+    "lifestyle": (
+        "lifestyle_preferences_agent",
+        "lifestyle_matching_task",
+        OutputFilePaths.LIFESTYLE_MATCHING,
+    ),
+    "reviews": (
+        "reviews_search_agent",
+        "search_and_summarize_reviews_task",
+        OutputFilePaths.REVIEWS_COLLECTION,
+    ),
+}
+
+
+# user_preferences fields read by each research task's prompt
+TASK_PREFERENCES = {
+    "safety": ("safety",),
+    "amenities": ("facilities",),
+    "budget": ("budget", "family"),
+    "lifestyle": ("lifestyle",),
+    "reviews": (),
+}
+
+
+def preference_fields(name):
+    """Preference fields a research task depends on."""
+    return TASK_PREFERENCES[name]
 
 
 class NeighborhoodTasks:
-    def safety_analysis_task(self, agent, city, preferences):
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+
+    def output_path(self, output_file_path):
+        if self.output_dir is None:
+            return output_file_path.value
+        return os.path.join(self.output_dir, output_file_path.value)
+
+    def focus(self, neighborhoods):
+        """Restricts a task to the neighborhoods whose stored results are stale."""
+        if not neighborhoods:
+            return ""
+        names = ", ".join(neighborhoods)
+        return f"\n                Only research these neighborhoods: {names}"
+
+    def safety_analysis_task(self, agent, city, preferences, neighborhoods=None):
         return Task(
             description=dedent(f"""
                 Analyze and score the safety of each neighborhood in the city of {city}. 
                 Use available data on crime rates and safety reports.
                 Consider the user's safety concerns: {preferences['safety']}
+                Query the local corpus before searching the internet.
                 Save intermediate results to a file and retrieve them as needed.
                 Your final output should be a detailed safety score for each neighborhood, 
                 along with a brief explanation of the data used and insights gained.
                 Be conscious about the tokens cost for response.
                 
-                City: {city}
+                City: {city}{self.focus(neighborhoods)}
             """),
             agent=agent,
-            expected_output=dedent("""
-                Output Format:
-                - Neighborhood: [Name of the neighborhood]
-                - Safety Score: [Calculated safety score]
-                - Data Sources: [List of data sources used]
-                - Summary: [Brief summary of the safety analysis]
-            """),
+            expected_output=record_format("safety score", "safety analysis"),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
                 FileTools.write_file,
                 FileTools.read_file,
             ],
-            output_file=OutputFilePaths.SAFETY_ANALYSIS.value,
         )
 
-    def amenities_evaluation_task(self, agent, city, preferences):
+    def amenities_evaluation_task(self, agent, city, preferences, neighborhoods=None):
         return Task(
             description=dedent(f"""
                 Evaluate and score the amenities available in each neighborhood in the city of {city}.
                 Consider factors such as the quality of schools, parks, public transport, and food and drink options.
                 Consider the user's preferences for facilities: {preferences['facilities']}
+                Query the local corpus before searching the internet.
                 Save intermediate results to a file and retrieve them as needed.
                 Your final output should be a detailed amenities score for each neighborhood, 
                 along with insights into the quality and availability of these amenities.
                 Be conscious about the tokens cost for response.
                 
-                City: {city}
+                City: {city}{self.focus(neighborhoods)}
             """),
             agent=agent,
-            expected_output=dedent("""
-                Output Format:
-                - Neighborhood: [Name of the neighborhood]
-                - Amenities Score: [Calculated amenities score]
-                - Data Sources: [List of data sources used]
-                - Summary: [Brief summary of the amenities evaluation]
-            """),
+            expected_output=record_format("amenities score", "amenities evaluation"),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
                 FileTools.write_file,
                 FileTools.read_file,
             ],
-            output_file=OutputFilePaths.AMENITIES_EVALUATION.value,
         )
 
-    def budget_analysis_task(self, agent, city, preferences):
+    def budget_analysis_task(self, agent, city, preferences, neighborhoods=None):
         return Task(
             description=dedent(f"""
                 Analyze the affordability of each neighborhood in the city of {city} based on the user's budget: {preferences['budget']}.
                 Evaluate the cost of living, housing prices, and other expenses.
+                First analyze neighborhood affordability once for the whole city
+                with the user's budget and household: {preferences.get('family', '')}
+                Only if no local cost data is available, compute affordability for
+                all neighborhoods in a single calculation, passing their costs
+                as a table.
                 Save intermediate results to a file and retrieve them as needed.
                 Your final output should be a detailed affordability score for each neighborhood, 
                 along with recommendations that fit within the user's budget.
                 
-                City: {city}
+                City: {city}{self.focus(neighborhoods)}
             """),
             agent=agent,
-            expected_output=dedent("""
-                Output Format:
-                - Neighborhood: [Name of the neighborhood]
-                - Affordability Score: [Calculated affordability score]
-                - Cost of Living: [Summary of the cost of living in the neighborhood]
-                - Summary: [Brief summary of the affordability analysis]
-            """),
+            expected_output=record_format(
+                "affordability score", "affordability analysis and cost of living"
+            ),
             tools=[
+                CorpusTools.query_local_corpus,
+                AffordabilityTools.analyze_affordability,
                 CalculatorTools.calculate,
                 FileTools.write_file,
                 FileTools.read_file,
             ],
-            output_file=OutputFilePaths.BUDGET_ANALYSIS.value,
         )
 
-    def lifestyle_matching_task(self, agent, city, preferences):
+    def lifestyle_matching_task(self, agent, city, preferences, neighborhoods=None):
         if not preferences.get("lifestyle"):
             return "Research is not needed."
 
@@ -118,47 +175,43 @@ class NeighborhoodTasks:
                 Your final output should be a list of neighborhoods that best match the user's lifestyle preferences, with explanations for each match.
                 Be conscious about the tokens cost for response.
                 
-                City: {city}
+                City: {city}{self.focus(neighborhoods)}
             """),
             agent=agent,
-            expected_output=dedent("""
-                Output Format:
-                - Neighborhood: [Name of the neighborhood]
-                - Lifestyle Preferences Match: [List of matching preferences]
-                - Summary: [Brief summary of the matching process]
-            """),
+            expected_output=record_format(
+                "lifestyle match score", "matching preferences"
+            ),
             tools=[
+                CorpusTools.query_local_corpus,
                 FileTools.write_file,
                 FileTools.read_file,
             ],
-            output_file=OutputFilePaths.LIFESTYLE_MATCHING.value,
         )
 
-    def search_and_summarize_reviews_task(self, agent, city, preferences):
+    def search_and_summarize_reviews_task(
+        self, agent, city, preferences, neighborhoods=None
+    ):
         return Task(
             description=dedent(f"""
                 Search and summarize user reviews and descriptions for each neighborhood in the city of {city}.
                 Use online sources to gather qualitative data.
+                Query the local corpus before searching the internet.
                 Save intermediate results to a file and retrieve them as needed.
                 Your final output should be a comprehensive set of user reviews and descriptions, 
                 along with a summary of common themes and insights for each neighborhood.
                 Be conscious about the tokens cost for response.
                 
-                City: {city}
+                City: {city}{self.focus(neighborhoods)}
             """),
             agent=agent,
-            expected_output=dedent("""
-                Output Format:
-                - Neighborhood: [Name of the neighborhood]
-                - Review: [User review text]
-                - Description: [Brief description of the neighborhood]
-                - Summary: [Summary of common themes and insights from reviews]
-            """),
+            expected_output=record_format(
+                "reviews sentiment score", "common themes and insights from reviews"
+            ),
             tools=[
+                CorpusTools.query_local_corpus,
                 SearchTools.search_internet,
                 BrowserTools.scrape_and_summarize_website,
                 FileTools.write_file,
                 FileTools.read_file,
             ],
-            output_file=OutputFilePaths.REVIEWS_COLLECTION.value,
         )
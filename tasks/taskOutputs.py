@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from textwrap import dedent
+from typing import List
+
+from pydantic import BaseModel, Field, ValidationError
+
+from tools.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+MAX_OUTPUT_RETRIES = int(os.environ.get("TASK_OUTPUT_RETRIES", "2"))
+
+# Validated records of earlier runs, keyed by the inputs they were produced from
+task_output_cache = DiskCache(
+    os.environ.get("TASK_OUTPUT_CACHE_PATH", "./workdir/task_outputs.sqlite"),
+    max_entries=int(os.environ.get("TASK_OUTPUT_CACHE_MAX_ENTRIES", "2000")),
+    ttls={"records": int(os.environ.get("TASK_OUTPUT_TTL", str(24 * 60 * 60)))},
+)
+
+_CODE_FENCE = re.compile(r"^```[a-zA-Z]*\s*$", re.MULTILINE)
+
+
+class NeighborhoodRecord(BaseModel):
+    neighborhood: str = Field(min_length=1)
+    score: float = Field(ge=0, le=10)
+    sources: List[str] = Field(default_factory=list)
+    summary: str
+
+
+class TaskOutputError(ValueError):
+    pass
+
+
+def record_format(score, analysis):
+    """expected_output text asking an agent for NeighborhoodRecord JSON Lines."""
+    example = (
+        f'{{"neighborhood": "<name of the neighborhood>", '
+        f'"score": <{score} from 0 to 10>, "sources": ["<data source or URL>"], '
+        f'"summary": "<brief summary of the {analysis}>"}}'
+    )
+    return (
+        "\nOutput Format: JSON Lines only, one JSON object per neighborhood "
+        f"and nothing else:\n{example}\n"
+    )
+
+
+def _candidate_objects(text):
+    text = _CODE_FENCE.sub("", text).strip()
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError:
+        document = None
+    if isinstance(document, list):
+        return document
+    if isinstance(document, dict):
+        return document.get("records", [document])
+    objects = []
+    for line in text.splitlines():
+        line = line.strip().rstrip(",")
+        if line.startswith("{"):
+            objects.append(json.loads(line))
+    return objects
+
+
+def parse_records(text):
+    """Parse an agent's answer into NeighborhoodRecords.
+
+    Accepts JSON Lines (the requested format), a JSON array or a
+    {"records": [...]} document, optionally inside a Markdown code fence.
+    Raises TaskOutputError when nothing valid can be read.
+    """
+    try:
+        objects = _candidate_objects(str(text))
+    except json.JSONDecodeError as e:
+        raise TaskOutputError(f"invalid JSON: {e}") from e
+    if not objects:
+        raise TaskOutputError("no JSON records found")
+    try:
+        return [NeighborhoodRecord.model_validate(obj) for obj in objects]
+    except ValidationError as e:
+        raise TaskOutputError(f"records do not match the schema: {e}") from e
+
+
+def retry_feedback(error, previous_output):
+    return dedent(f"""
+        Your previous answer could not be used: {error}
+        Previous answer (truncated):
+        {str(previous_output)[:1500]}
+        Answer again with JSON Lines only, exactly in the required output format.
+    """)
+
+
+def validated_records(task, output, retries=MAX_OUTPUT_RETRIES):
+    """Parse a task's output, re-running the task with feedback while it is malformed.
+
+    Returns None when the output is still malformed after the retries, so
+    one failed dimension is left out of the ranking instead of failing the
+    whole run.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return parse_records(output)
+        except TaskOutputError as e:
+            if attempt == retries:
+                logger.warning(
+                    "%s returned malformed output after %d retries, "
+                    "leaving its results out: %s",
+                    task.agent.role,
+                    retries,
+                    e,
+                )
+                return None
+            output = task.execute(context=retry_feedback(e, output))
+
+
+def merge_records(stored, new):
+    """Stored records updated with newly researched ones, matched by neighborhood."""
+    merged = {record.neighborhood.strip(): record for record in stored}
+    merged.update((record.neighborhood.strip(), record) for record in new)
+    return list(merged.values())
+
+
+def write_records(path, records):
+    """Write records as JSON Lines, replacing the file atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(record.model_dump_json() + "\n")
+    os.replace(temporary_path, path)
+
+
+def iter_records(path):
+    """Stream NeighborhoodRecords from a JSON Lines file, one line at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield NeighborhoodRecord.model_validate_json(line)
+            except ValidationError as e:
+                raise TaskOutputError(f"{path}:{line_number}: {e}") from e
+
+
+def input_fingerprint(name, city, preferences, fields):
+    """Hash of everything a task's output depends on.
+
+    That is the task's name, the city and the task's preference fields.
+    """
+    inputs = {
+        "task": name,
+        "city": " ".join(city.split()).casefold(),
+        "preferences": {field: preferences.get(field) for field in fields},
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def cached_records(fingerprint):
+    """Records produced earlier from the same inputs, or None."""
+    rows = task_output_cache.get("records", fingerprint)
+    if rows is None:
+        return None
+    return [NeighborhoodRecord.model_validate(row) for row in rows]
+
+
+def cache_records(fingerprint, records):
+    task_output_cache.set(
+        "records", fingerprint, [record.model_dump() for record in records]
+    )
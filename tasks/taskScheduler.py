@@ -0,0 +1,96 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Caps how many scheduled tasks run at once across every scheduler in the
+# process, so concurrent crews do not multiply the load on the APIs.
+MAX_CONCURRENT_TASKS = int(os.environ.get("CREW_MAX_CONCURRENT_TASKS", "5"))
+_task_slots = threading.BoundedSemaphore(MAX_CONCURRENT_TASKS)
+
+
+class TaskScheduler:
+    """Runs named callables as a dependency graph on a thread pool.
+
+    Each node is called with the results of its dependencies as keyword
+    arguments, as soon as all of them have finished. Nodes without a path
+    between them run concurrently.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_TASKS):
+        self.max_concurrency = max_concurrency
+        self.nodes = {}
+        self.timings = {}
+
+    def add(self, name, fn, depends_on=()):
+        if name in self.nodes:
+            raise ValueError(f"Task '{name}' is already scheduled")
+        self.nodes[name] = (fn, tuple(depends_on))
+        return name
+
+    def _check_graph(self):
+        for name, (_, depends_on) in self.nodes.items():
+            missing = [dep for dep in depends_on if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Task '{name}' depends on unknown tasks {missing}")
+
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through task '{name}'")
+            visiting.add(name)
+            for dep in self.nodes[name][1]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def _execute(self, name, fn, kwargs):
+        with _task_slots:
+            started = time.perf_counter()
+            try:
+                return fn(**kwargs)
+            finally:
+                self.timings[name] = (started, time.perf_counter())
+
+    def run(self):
+        """Run every node and return a dict of results keyed by node name."""
+        self._check_graph()
+        results = {}
+        pending = dict(self.nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            while pending or running:
+                ready = [
+                    name
+                    for name, (_, depends_on) in pending.items()
+                    if all(dep in results for dep in depends_on)
+                ]
+                for name in ready:
+                    fn, depends_on = pending.pop(name)
+                    kwargs = {dep: results[dep] for dep in depends_on}
+                    # Run in a copy of the caller's context so context variables
+                    # (such as the run metrics collector) carry over.
+                    future = executor.submit(
+                        contextvars.copy_context().run, self._execute, name, fn, kwargs
+                    )
+                    running[future] = name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+
+        return results
@@ -92,5 +92,6 @@ def main():
     return result
 
 
-result = main()
-print(result)
+if __name__ == "__main__":
+    result = main()
+    print(result)
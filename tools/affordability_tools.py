@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+from langchain.tools import tool
+
+from tools.run_metrics import track_tool
+
+COST_OF_LIVING_DIR = os.environ.get(
+    "COST_OF_LIVING_DIR", "./workdir/cost_of_living"
+)
+# Columns that are monthly costs per person; other numeric columns are per
+# household
+PER_PERSON_COSTS = ("groceries", "transport")
+
+_AMOUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(?:(k|thousand)\b)?", re.IGNORECASE)
+
+
+class AffordabilityError(ValueError):
+    pass
+
+
+def parse_amounts(text):
+    amounts = []
+    for number, thousands in _AMOUNT.findall(text):
+        value = float(number.replace(",", ""))
+        amounts.append(value * 1000 if thousands else value)
+    return amounts
+
+
+def parse_budget(text):
+    """Monthly (low, high) budget from text such as "2000-2700 USD per month".
+
+    A single amount is read as the upper limit, with the lower end 20% below
+    it; yearly amounts are converted to monthly ones.
+    """
+    amounts = parse_amounts(text)
+    if not amounts:
+        raise AffordabilityError(f"No amount found in budget '{text}'")
+    if re.search(r"\b(year|yearly|annual|annually|per annum)\b", text, re.IGNORECASE):
+        amounts = [amount / 12 for amount in amounts]
+    if len(amounts) == 1:
+        return 0.8 * amounts[0], amounts[0]
+    return min(amounts[:2]), max(amounts[:2])
+
+
+def parse_household(text):
+    """Number of household members from text such as "2 members: 2 adults"."""
+    text = text or ""
+    members = re.search(r"(\d+)\s*(?:members|people|persons)", text, re.IGNORECASE)
+    adults = re.search(r"(\d+)\s*adults?", text, re.IGNORECASE)
+    children = re.search(r"(\d+)\s*(?:children|kids?)", text, re.IGNORECASE)
+    adult_count = int(adults.group(1)) if adults else 1
+    child_count = int(children.group(1)) if children else 0
+    member_count = int(members.group(1)) if members else adult_count + child_count
+    return max(1, member_count)
+
+
+def _slug(city):
+    return re.sub(r"[^a-z0-9]+", "_", city.casefold()).strip("_")
+
+
+def cost_table_path(city, directory=COST_OF_LIVING_DIR):
+    for extension in (".csv", ".json"):
+        path = os.path.join(directory, _slug(city) + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _cost(value):
+    # Missing and blank cells are unknown; 0 is a real cost
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return np.nan
+    return float(value)
+
+
+@lru_cache(maxsize=32)
+def _load_cost_table(path, _modified):
+    # _modified (the file's mtime) is only part of the cache key
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        if isinstance(document, dict):
+            rows = [
+                {"neighborhood": name, **costs} if isinstance(costs, dict) else None
+                for name, costs in document.items()
+            ]
+        else:
+            rows = document
+        if not isinstance(rows, list) or not all(
+            isinstance(row, dict) for row in rows
+        ):
+            raise AffordabilityError(
+                f"{path} must hold a list of neighborhood objects or an object of them"
+            )
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    if not rows or any("neighborhood" not in row or "rent" not in row for row in rows):
+        raise AffordabilityError(
+            f"{path} needs a 'neighborhood' and a 'rent' value in every row"
+        )
+
+    names = [str(row["neighborhood"]).strip() for row in rows]
+    columns = {column for row in rows for column in row if column != "neighborhood"}
+    costs = {}
+    for column in sorted(columns):
+        try:
+            costs[column] = np.array(
+                [_cost(row.get(column)) for row in rows], dtype=float
+            )
+        except (TypeError, ValueError):
+            continue  # descriptive columns are ignored
+    return names, costs
+
+
+def load_cost_table(city, directory=COST_OF_LIVING_DIR):
+    """Neighborhood names and a dict of NumPy cost columns for the city.
+
+    Tables live in <directory>/<city>.csv or .json (lower case, words
+    joined by underscores) with one row per neighborhood: "neighborhood",
+    monthly "rent", and optionally further monthly costs such as
+    "utilities", "groceries" or "transport". Parsed tables are cached until
+    the file changes.
+    """
+    path = cost_table_path(city, directory)
+    if path is None:
+        raise AffordabilityError(
+            f"No cost-of-living table for {city} in {directory} "
+            f"(expected {_slug(city)}.csv or {_slug(city)}.json)"
+        )
+    return _load_cost_table(path, os.path.getmtime(path))
+
+
+def affordability(costs, budget, household=""):
+    """Affordability of every neighborhood in one vectorized pass.
+
+    Returns a dict of NumPy arrays aligned with the cost columns: "score"
+    (0-10, 10 when rent is at or below the low end of the budget, 6 at the
+    high end, 0 at 1.5 times the high end), "rent", "monthly_cost" and
+    "headroom" (high end of the budget minus rent).
+    """
+    low, high = parse_budget(budget)
+    members = parse_household(household)
+    low = min(low, high * 0.99)
+    rent = costs["rent"]
+    monthly_cost = rent.copy()
+    for column, values in costs.items():
+        if column == "rent":
+            continue
+        scale = members if column in PER_PERSON_COSTS else 1
+        monthly_cost += np.nan_to_num(values) * scale
+    return {
+        "score": np.round(np.interp(rent, [low, high, 1.5 * high], [10, 6, 0]), 1),
+        "rent": rent,
+        "monthly_cost": monthly_cost,
+        "headroom": high - rent,
+    }
+
+
+class AffordabilityTools:
+    @tool("Analyze neighborhood affordability")
+    @track_tool("analyze_affordability")
+    def analyze_affordability(city, budget, household=""):
+        """Useful to score the affordability of every neighborhood of a city at once,
+        from local rent and cost-of-living data. The input is the city, the user's
+        budget as written by the user (for example "2000-2700 USD per month") and an
+        optional household description (for example "2 members: 2 adults (working)").
+        Returns one line per neighborhood, most affordable first."""
+        try:
+            names, costs = load_cost_table(city)
+            results = affordability(costs, budget, household)
+        except (AffordabilityError, OSError, ValueError) as e:
+            return f"Error: {e}"
+        lines = []
+        for i in np.argsort(-results["score"], kind="stable"):
+            if np.isnan(results["rent"][i]):
+                lines.append(f"{names[i]}: no rent data")
+                continue
+            lines.append(
+                f"{names[i]}: affordability score {results['score'][i]:g}/10, "
+                f"rent {results['rent'][i]:,.0f} USD, "
+                f"total monthly cost {results['monthly_cost'][i]:,.0f} USD, "
+                f"headroom {results['headroom'][i]:,.0f} USD/month"
+            )
+        return "\n".join(lines)
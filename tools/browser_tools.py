@@ -1,38 +1,183 @@
+import contextvars
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from crewai import Agent, Task
 from crewai_tools import ScrapeWebsiteTool
 from langchain.tools import tool
 
+from agents.modelRouter import routed_llm
+from tools.corpus_index import index_text
+from tools.disk_cache import DiskCache
+from tools.rate_limiter import rate_limiter
+from tools.run_metrics import track_tool
+from tools.text_chunker import prepare_chunks
+from tools.url_frontier import FrontierFull, normalize_url, url_frontier
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "4000"))
+SUMMARY_CHUNK_OVERLAP = int(os.environ.get("SUMMARY_CHUNK_OVERLAP", "100"))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+# Merged summaries longer than this many characters go through a reduce step;
+# 0 disables the reduce step.
+SUMMARY_MAX_CHARS = int(os.environ.get("SUMMARY_MAX_CHARS", "4000"))
+
+PAGE_NAMESPACE = "page"
+CHUNK_SUMMARY_NAMESPACE = "chunk_summary"
+
+# Raw page text expires by URL; chunk summaries are content-addressed and
+# never go stale, so an unchanged chunk of a re-fetched page costs no LLM call.
+scrape_cache = DiskCache(
+    os.environ.get("SCRAPE_CACHE_PATH", "./workdir/scrape_cache.sqlite"),
+    max_entries=int(os.environ.get("SCRAPE_CACHE_MAX_ENTRIES", "20000")),
+    ttls={PAGE_NAMESPACE: float(os.environ.get("PAGE_CACHE_TTL", 24 * 3600))},
+)
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _download(url):
+    # A fetch of the same URL may have finished while this one was queued
+    content = scrape_cache.get(PAGE_NAMESPACE, url)
+    if content is None:
+        with rate_limiter("web").slot() as call:
+            content = ScrapeWebsiteTool(website_url=url).run()
+            call.succeeded()
+        scrape_cache.set(PAGE_NAMESPACE, url, content)
+    return content
+
+
+def fetch_page(website):
+    url = normalize_url(website)
+    content = scrape_cache.get(PAGE_NAMESPACE, url)
+    if content is None:
+        content = url_frontier.fetch(url, _download)
+    return content
+
+
+def _summarize(content, summeryAndOutputRequirements, description, route):
+    agent = Agent(
+        role="Principal Researcher",
+        goal=f"""Do amazing research and summaries based on the content
+        you are working with. Your input might be a chunk of data.
+        Summary (output) requirements: {summeryAndOutputRequirements}.
+        """,
+        backstory=(
+            "You're a Principal Researcher at a big company and you need to do "
+            "research about a given topic."
+        ),
+        allow_delegation=False,
+        llm=routed_llm(route),
+    )
+    task = Task(
+        agent=agent,
+        description=f"{description}\n\nCONTENT\n----------\n{content}",
+        expected_output="A concise and relevant summary of the provided content chunk.",
+    )
+    return task.execute()
+
+
+def summarize_chunk(chunk, summeryAndOutputRequirements):
+    key = f"{_sha256(chunk)}:{_sha256(summeryAndOutputRequirements)}"
+    summary = scrape_cache.get(CHUNK_SUMMARY_NAMESPACE, key)
+    if summary is None:
+        summary = _summarize(
+            chunk,
+            summeryAndOutputRequirements,
+            "Analyze and summarize the content below, make sure to include the "
+            "most relevant information in the summary, return only the summary "
+            "nothing else.",
+            "chunk_summary",
+        )
+        scrape_cache.set(CHUNK_SUMMARY_NAMESPACE, key, summary)
+    return summary
+
+
+def reduce_summaries(
+    summaries, summeryAndOutputRequirements, max_chars=SUMMARY_MAX_CHARS
+):
+    """Merge partial summaries into one summary of at most max_chars characters."""
+    merged = "\n\n".join(summaries)
+    if max_chars <= 0 or len(summaries) < 2 or len(merged) <= max_chars:
+        return merged
+    key = f"{_sha256(merged)}:{_sha256(summeryAndOutputRequirements)}:{max_chars}"
+    reduced = scrape_cache.get(CHUNK_SUMMARY_NAMESPACE, key)
+    if reduced is None:
+        reduced = _summarize(
+            merged,
+            summeryAndOutputRequirements,
+            "The content below is a set of partial summaries of one web page, "
+            "in page order. Merge them into a single summary without repeating "
+            f"information, keep it under {max_chars} characters and return only "
+            "the summary nothing else.",
+            "summary_reduce",
+        )[:max_chars]
+        scrape_cache.set(CHUNK_SUMMARY_NAMESPACE, key, reduced)
+    return reduced
+
+
+def map_summaries(
+    chunks, summeryAndOutputRequirements, concurrency=SUMMARY_CONCURRENCY
+):
+    """Summarize chunks on a bounded worker pool, returning results in chunk order."""
+    if len(chunks) <= 1 or concurrency <= 1:
+        return [
+            summarize_chunk(chunk, summeryAndOutputRequirements) for chunk in chunks
+        ]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+        # Each chunk runs in a copy of the caller's context so its LLM calls
+        # are attributed to the calling agent and task.
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                summarize_chunk,
+                chunk,
+                summeryAndOutputRequirements,
+            )
+            for chunk in chunks
+        ]
+        return [future.result() for future in futures]
+
+
+def scrape_and_summarize(url, summeryAndOutputRequirements):
+    # Extract the text from the site, reusing a recent fetch of the same URL
+    content = fetch_page(url)
+
+    # Strip boilerplate and split on paragraph/sentence boundaries
+    content_chunks, stats = prepare_chunks(
+        content, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_OVERLAP
+    )
+    logger.info(
+        "%s: %d tokens in, %d tokens out in %d chunks",
+        url,
+        stats["tokens_in"],
+        stats["tokens_out"],
+        stats["chunks"],
+    )
+    index_text("page", url, content_chunks)
+    summaries = map_summaries(content_chunks, summeryAndOutputRequirements)
+
+    return reduce_summaries(summaries, summeryAndOutputRequirements)
+
 
 class BrowserTools:
     @tool("Scrape the website and summarize the content")
+    @track_tool("scrape_and_summarize_website")
     def scrape_and_summarize_website(website, summeryAndOutputRequirements):
         """Useful to scrape and summarize a website content"""
-        # Initialize the tool with the website URL
-        tool = ScrapeWebsiteTool(website_url=website)
-
-        # Extract the text from the site
-        content = tool.run()
-
-        # Split content into chunks if it's too large
-        content_chunks = [content[i : i + 8000] for i in range(0, len(content), 8000)]
-        summaries = []
-
-        for chunk in content_chunks:
-            agent = Agent(
-                role="Principal Researcher",
-                goal=f"""Do amazing research and summaries based on the content 
-                you are working with. Your input might be a chunk of data.
-                Summary (output) requirements: {summeryAndOutputRequirements}.
-                """,
-                backstory="You're a Principal Researcher at a big company and you need to do research about a given topic.",
-                allow_delegation=False,
-            )
-            task = Task(
-                agent=agent,
-                description=f"Analyze and summarize the content below, make sure to include the most relevant information in the summary, return only the summary nothing else.\n\nCONTENT\n----------\n{chunk}",
-                expected_output="A concise and relevant summary of the provided content chunk.",
+        url = normalize_url(website)
+        # Agents asking for the same page and summary at the same time share
+        # one scrape and one set of summary calls.
+        try:
+            return url_frontier.shared(
+                (url, summeryAndOutputRequirements),
+                partial(scrape_and_summarize, url, summeryAndOutputRequirements),
             )
-            summary = task.execute()
-            summaries.append(summary)
-
-        return "\n\n".join(summaries)
+        except FrontierFull as e:
+            return f"Error: {e}"
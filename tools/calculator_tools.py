@@ -1,15 +1,204 @@
+import ast
+import functools
+import json
+import math
+import operator
+
+import numpy as np
 from langchain.tools import tool
 
+from tools.run_metrics import track_tool
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_EXPONENT = 100
+# Integer powers with more digits than this are refused before computing them;
+# larger results could not be formatted as floats anyway.
+MAX_RESULT_DIGITS = 308
+
+
+class CalculatorError(ValueError):
+    pass
+
+
+def _power(base, exponent):
+    if np.any(np.abs(exponent) > MAX_EXPONENT):
+        raise CalculatorError(f"Exponents are limited to {MAX_EXPONENT}")
+    # Python integers grow without bound, so nested powers such as
+    # (10**100)**100 are sized up from their logarithm first
+    if (
+        isinstance(base, int)
+        and isinstance(exponent, int)
+        and exponent > 0
+        and abs(base) > 1
+        and math.log10(abs(base)) * exponent > MAX_RESULT_DIGITS
+    ):
+        raise CalculatorError(f"Results are limited to {MAX_RESULT_DIGITS} digits")
+    return base**exponent
+
+
+def _reduce(elementwise):
+    # min(a, b, ...) and max(a, b, ...) also work elementwise on table columns
+    return lambda *args: functools.reduce(elementwise, args)
+
+
+def _percent(part, whole):
+    return part / whole * 100
+
+
+def _round(value, digits=0):
+    return np.round(value, int(digits))
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+FUNCTIONS = {
+    "min": _reduce(np.minimum),
+    "max": _reduce(np.maximum),
+    "round": _round,
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "percent": _percent,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+
+def _compile_node(node):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda _: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda _: value
+
+        def variable(variables):
+            if name not in variables:
+                raise CalculatorError(f"Unknown variable '{name}'")
+            return variables[name]
+
+        return variable
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        apply = _BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda variables: apply(left(variables), right(variables))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        apply = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda variables: apply(operand(variables))
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in FUNCTIONS
+        and not node.keywords
+    ):
+        function = FUNCTIONS[node.func.id]
+        args = [_compile_node(arg) for arg in node.args]
+        return lambda variables: function(*(arg(variables) for arg in args))
+    raise CalculatorError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression):
+    """Compile an arithmetic expression into a function of a variables dict.
+
+    Only numbers, + - * / // % **, named variables, pi and e, and the
+    functions in FUNCTIONS are allowed; anything else raises
+    CalculatorError. Variables may be numbers or NumPy arrays, so one
+    compiled expression evaluates a whole table column at once.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError(
+            f"Expressions are limited to {MAX_EXPRESSION_LENGTH} characters"
+        )
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalculatorError("Invalid syntax in mathematical expression") from e
+    return _compile_node(tree.body)
+
+
+def evaluate(expression, variables=None):
+    return compile_expression(expression)(variables or {})
+
+
+def evaluate_table(expression, rows, variables=None):
+    """Evaluate one expression for every row of {name: {variable: value}}.
+
+    Each variable becomes a NumPy column (NaN where a row lacks it), so the
+    expression runs once for the whole table. Returns {name: value}, with
+    None where the result is undefined.
+    """
+    if not isinstance(rows, dict) or not all(
+        isinstance(row, dict) for row in rows.values()
+    ):
+        raise CalculatorError("The table must map each name to an object of variables")
+    if not isinstance(variables or {}, dict):
+        raise CalculatorError("The variables must be an object")
+    names = list(rows)
+    columns = {key for row in rows.values() for key in row}
+    table = {
+        column: np.array(
+            [float(rows[name].get(column, np.nan)) for name in names], dtype=float
+        )
+        for column in columns
+    }
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = evaluate(expression, {**(variables or {}), **table})
+        results = np.broadcast_to(np.asarray(result, dtype=float), (len(names),))
+    return {
+        name: float(value) if np.isfinite(value) else None
+        for name, value in zip(names, results, strict=True)
+    }
+
+
+def _format(value):
+    if value is None or not math.isfinite(value):
+        return "undefined"
+    value = round(float(value), 4)
+    if value.is_integer():
+        return str(int(value))
+    return str(value)
+
 
 class CalculatorTools:
     @tool("Make a calculation")
+    @track_tool("calculate")
     def calculate(operation):
         """Useful to perform any mathematical calculations,
         like sum, minus, multiplication, division, etc.
         The input to this tool should be a mathematical
-        expression, a couple examples are `200*7` or `5000/2*10`
+        expression, a couple examples are `200*7` or `5000/2*10`.
+        Functions min, max, round, abs, sqrt and percent(part, whole) are available.
+        To compute the same formula for many neighborhoods in one call, pass JSON:
+        {"expression": "percent(rent * 12, income)", "variables": {"income": 90000},
+        "table": {"Ballard": {"rent": 2400}, "Fremont": {"rent": 2100}}}
         """
         try:
-            return eval(operation)
-        except SyntaxError:
-            return "Error: Invalid syntax in mathematical expression"
+            if operation.strip().startswith("{"):
+                request = json.loads(operation)
+                results = evaluate_table(
+                    request["expression"],
+                    request.get("table") or {},
+                    request.get("variables"),
+                )
+                return "\n".join(
+                    f"{name}: {_format(value)}" for name, value in results.items()
+                )
+            return _format(evaluate(operation))
+        except json.JSONDecodeError as e:
+            return f"Error: Invalid JSON input: {e}"
+        except KeyError as e:
+            return f"Error: Missing field {e} in JSON input"
+        except ZeroDivisionError:
+            return "Error: Division by zero"
+        except (CalculatorError, TypeError, ValueError, OverflowError) as e:
+            return f"Error: {e}"
@@ -0,0 +1,373 @@
+import contextvars
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+
+from langchain.tools import tool
+
+from tools.run_metrics import track_tool
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+CORPUS_INDEX_PATH = os.environ.get("CORPUS_INDEX_PATH", "./workdir/corpus_index.sqlite")
+# Documents fetched longer ago than this are neither returned nor kept by compact()
+CORPUS_MAX_AGE = float(os.environ.get("CORPUS_MAX_AGE", str(180 * DAY)))
+CORPUS_QUERY_RESULTS = int(os.environ.get("CORPUS_QUERY_RESULTS", "5"))
+# compact() runs on its own once this share of the documents is superseded
+COMPACT_RATIO = 0.25
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset(
+    {
+        "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has",
+        "have", "in", "is", "it", "its", "of", "on", "or", "that", "the", "their",
+        "there", "this", "to", "was", "were", "will", "with",
+    }
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+CorpusHit = namedtuple(
+    "CorpusHit",
+    ["source", "kind", "city", "neighborhood", "text", "fetched_at", "score"],
+)
+
+_current_city = contextvars.ContextVar("corpus_city", default="")
+
+
+@contextmanager
+def corpus_scope(city):
+    """Tag documents indexed in this context (and copies of it) with city."""
+    token = _current_city.set(city)
+    try:
+        yield
+    finally:
+        _current_city.reset(token)
+
+
+def tokenize(text):
+    return [
+        token for token in _TOKEN.findall(text.casefold()) if token not in STOPWORDS
+    ]
+
+
+def _city(city):
+    return " ".join((city or "").split()).casefold()
+
+
+class CorpusIndex:
+    """BM25 inverted index over fetched text, stored in SQLite.
+
+    Each document is one search result or one chunk of a scraped page, keyed
+    by (source URL, kind, position) and tagged with the city being researched
+    and, once the city's neighborhoods are known, the neighborhood it
+    mentions most. Re-adding a source with unchanged text only refreshes its
+    fetch time; changed text supersedes the old document, whose postings stay
+    in place until compact() removes them.
+    """
+
+    def __init__(self, path=CORPUS_INDEX_PATH, max_age=CORPUS_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    city TEXT NOT NULL,
+                    neighborhood TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    live INTEGER NOT NULL DEFAULT 1,
+                    scanned INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute(
+                """CREATE INDEX IF NOT EXISTS documents_source
+                ON documents (source, kind, position)"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    document INTEGER NOT NULL,
+                    frequency INTEGER NOT NULL,
+                    PRIMARY KEY (term, document)
+                ) WITHOUT ROWID"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS neighborhoods (
+                    city TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    PRIMARY KEY (city, name)
+                ) WITHOUT ROWID"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    def add(self, kind, source, texts, city=None):
+        """Index texts from source: the chunks of one page, or one search result.
+
+        Returns how many documents were new or changed.
+        """
+        city = _city(city if city is not None else _current_city.get())
+        now = time.time()
+        changed = 0
+        with self._lock:
+            conn = self._connect()
+            live = {
+                position: (document, digest)
+                for document, position, digest in conn.execute(
+                    """SELECT id, position, digest FROM documents
+                    WHERE source = ? AND kind = ? AND live = 1""",
+                    (source, kind),
+                )
+            }
+            for position, text in enumerate(texts):
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                document, old_digest = live.pop(position, (None, None))
+                if old_digest == digest:
+                    conn.execute(
+                        "UPDATE documents SET fetched_at = ?, city = ? WHERE id = ?",
+                        (now, city, document),
+                    )
+                    continue
+                if document is not None:
+                    conn.execute(
+                        "UPDATE documents SET live = 0 WHERE id = ?", (document,)
+                    )
+                terms = Counter(tokenize(text))
+                if not terms:
+                    continue
+                document = conn.execute(
+                    """INSERT INTO documents (source, kind, position, city,
+                        neighborhood, digest, text, length, fetched_at)
+                    VALUES (?, ?, ?, ?, '', ?, ?, ?, ?)""",
+                    (
+                        source,
+                        kind,
+                        position,
+                        city,
+                        digest,
+                        text,
+                        sum(terms.values()),
+                        now,
+                    ),
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, document, frequency) for term, frequency in terms.items()],
+                )
+                changed += 1
+            # Positions past the end of a page that got shorter
+            conn.executemany(
+                "UPDATE documents SET live = 0 WHERE id = ?",
+                [(document,) for document, _ in live.values()],
+            )
+            conn.commit()
+            total, dead = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(live = 0), 0) FROM documents"
+            ).fetchone()
+        if dead > 100 and dead > COMPACT_RATIO * total:
+            self.compact()
+        return changed
+
+    def tag_neighborhoods(self, city, neighborhoods):
+        """Tag the city's documents with the neighborhood they mention most.
+
+        Documents are matched against every neighborhood ever reported for
+        the city, not only these. Each document is scanned once, unless
+        neighborhoods adds a name the city did not have; then all of its
+        documents are scanned again. Names match whole words only, so
+        "North" does not count inside "Northside".
+        """
+        city = _city(city)
+        names = {name.strip() for name in neighborhoods if name.strip()}
+        if not names:
+            return
+        with self._lock:
+            conn = self._connect()
+            known = {
+                name
+                for (name,) in conn.execute(
+                    "SELECT name FROM neighborhoods WHERE city = ?", (city,)
+                )
+            }
+            if names - known:
+                conn.executemany(
+                    "INSERT INTO neighborhoods VALUES (?, ?)",
+                    [(city, name) for name in sorted(names - known)],
+                )
+                conn.execute("UPDATE documents SET scanned = 0 WHERE city = ?", (city,))
+            patterns = {
+                name: re.compile(rf"(?<!\w){re.escape(name)}(?!\w)", re.IGNORECASE)
+                for name in sorted(names | known)
+            }
+            rows = conn.execute(
+                """SELECT id, text FROM documents
+                WHERE city = ? AND scanned = 0 AND live = 1""",
+                (city,),
+            ).fetchall()
+            updates = []
+            for document, text in rows:
+                counts = {
+                    name: len(pattern.findall(text))
+                    for name, pattern in patterns.items()
+                }
+                best = max(counts, key=counts.get)
+                updates.append((best if counts[best] else "", document))
+            conn.executemany(
+                "UPDATE documents SET neighborhood = ?, scanned = 1 WHERE id = ?",
+                updates,
+            )
+            conn.commit()
+
+    def search(self, query, city=None, neighborhood=None, limit=CORPUS_QUERY_RESULTS):
+        """The limit best CorpusHits for query by BM25.
+
+        city and neighborhood, when given, restrict the search to their documents.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        filters = ["d.live = 1", "d.fetched_at >= ?"]
+        parameters = [time.time() - self.max_age]
+        if city:
+            filters.append("d.city = ?")
+            parameters.append(_city(city))
+        if neighborhood:
+            filters.append("d.neighborhood = ? COLLATE NOCASE")
+            parameters.append(neighborhood.strip())
+        where = " AND ".join(filters)
+        scores = defaultdict(float)
+        with self._lock:
+            conn = self._connect()
+            # Collection statistics over the same documents the postings are
+            # filtered to, so IDF compares like with like
+            count, average_length = conn.execute(
+                f"SELECT COUNT(*), AVG(d.length) FROM documents d WHERE {where}",
+                parameters,
+            ).fetchone()
+            average_length = average_length or 1.0
+            for term in terms:
+                rows = conn.execute(
+                    f"""SELECT p.document, p.frequency, d.length
+                    FROM postings p JOIN documents d ON d.id = p.document
+                    WHERE p.term = ? AND {where}""",
+                    [term, *parameters],
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                for document, frequency, length in rows:
+                    norm = K1 * (1 - B + B * length / average_length)
+                    scores[document] += idf * frequency * (K1 + 1) / (frequency + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            best = best[:limit]
+            hits = []
+            for document, score in best:
+                source, kind, city, neighborhood, text, fetched_at = conn.execute(
+                    """SELECT source, kind, city, neighborhood, text, fetched_at
+                    FROM documents WHERE id = ?""",
+                    (document,),
+                ).fetchone()
+                hits.append(
+                    CorpusHit(source, kind, city, neighborhood, text, fetched_at, score)
+                )
+        return hits
+
+    def compact(self):
+        """Drop superseded and expired documents and their postings, then VACUUM."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE documents SET live = 0 WHERE fetched_at < ?",
+                (time.time() - self.max_age,),
+            )
+            conn.execute(
+                """DELETE FROM postings
+                WHERE document IN (SELECT id FROM documents WHERE live = 0)"""
+            )
+            removed = conn.execute("DELETE FROM documents WHERE live = 0").rowcount
+            conn.commit()
+            conn.execute("VACUUM")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM neighborhoods")
+            conn.commit()
+
+
+corpus_index = CorpusIndex()
+
+
+def index_text(kind, source, texts):
+    """Add fetched text to the corpus; indexing errors never fail the fetching tool."""
+    try:
+        corpus_index.add(kind, source, texts)
+    except sqlite3.Error as e:
+        logger.warning("Could not index %s: %s", source, e)
+
+
+def _format_hits(hits, max_chars=600):
+    string = []
+    for hit in hits:
+        fetched = time.strftime("%Y-%m-%d", time.localtime(hit.fetched_at))
+        text = hit.text if len(hit.text) <= max_chars else hit.text[:max_chars] + "..."
+        string.append(
+            "\n".join(
+                [
+                    f"Source: {hit.source} ({hit.kind}, fetched {fetched})",
+                    f"Neighborhood: {hit.neighborhood or 'unknown'}",
+                    f"Text: {text}",
+                    "\n-----------------",
+                ]
+            )
+        )
+    return "\n".join(string)
+
+
+class CorpusTools:
+    @tool("Query local corpus")
+    @track_tool("query_local_corpus")
+    def query_local_corpus(query, neighborhood=""):
+        """Useful to search the search results and web pages already fetched for
+        this city, in milliseconds and at no cost. Use it before searching the
+        internet; search the internet only if it has nothing relevant.
+        The input is the query and optionally a neighborhood name to restrict it to."""
+        try:
+            hits = corpus_index.search(
+                query, city=_current_city.get(), neighborhood=neighborhood
+            )
+        except sqlite3.Error as e:
+            return f"Error querying the local corpus: {e}"
+        if not hits:
+            return "Nothing relevant in the local corpus; search the internet instead."
+        return _format_hits(hits)
@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+
+class DiskCache:
+    """SQLite-backed key/value cache with per-namespace TTL and LRU eviction.
+
+    Values are stored as JSON. Every entry belongs to a namespace (for example
+    the Serper endpoint), so one database file can hold several caches that
+    expire on their own schedule but share one size bound.
+    """
+
+    def __init__(self, path, max_entries=10000, ttls=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, namespace, key):
+        """Return the cached value, or None when missing or expired."""
+        now = time.time()
+        ttl = self.ttls.get(namespace)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses[namespace] += 1
+                return None
+            value, created_at = row
+            if ttl is not None and now - created_at > ttl:
+                conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+                conn.commit()
+                self.misses[namespace] += 1
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+            conn.commit()
+            self.hits[namespace] += 1
+        return json.loads(value)
+
+    def set(self, namespace, key, value):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                """INSERT OR REPLACE INTO entries
+                (namespace, key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                (namespace, key, json.dumps(value), now, now),
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                """DELETE FROM entries WHERE rowid IN (
+                    SELECT rowid FROM entries ORDER BY accessed_at ASC LIMIT ?
+                )""",
+                (overflow,),
+            )
+
+    def clear(self, namespace=None):
+        with self._lock:
+            conn = self._connect()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.commit()
+
+    def stats(self):
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            namespace: {
+                "hits": self.hits[namespace],
+                "misses": self.misses[namespace],
+            }
+            for namespace in sorted(namespaces)
+        }
@@ -1,40 +1,212 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
 from langchain.tools import tool
 
+from tools.run_metrics import track_tool
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+WORKDIR = "./workdir"
+READ_MAX_LINES = int(os.environ.get("FILE_READ_MAX_LINES", "200"))
+GREP_MAX_MATCHES = int(os.environ.get("FILE_GREP_MAX_MATCHES", "50"))
+
+# The umask can only be read by setting it, which would race other threads
+# creating files, so it is read once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_thread_locks = defaultdict(threading.Lock)
+_thread_locks_guard = threading.Lock()
+
+
+class FileToolError(ValueError):
+    pass
+
+
+def resolve_path(relative_path):
+    """Path of a file inside WORKDIR; anything resolving outside it is refused."""
+    relative_path = str(relative_path).strip().strip("`'\"").strip()
+    if relative_path.startswith("/workdir/"):
+        relative_path = relative_path[len("/workdir/") :]
+    root = os.path.realpath(WORKDIR)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if not relative_path or os.path.commonpath([root, path]) != root:
+        raise FileToolError(f"'{relative_path}' is not a file path inside the workdir")
+    return path
+
+
+@contextmanager
+def file_lock(path, exclusive=True):
+    """Lock a workdir file against other threads and processes.
+
+    The lock is held on a sidecar file in WORKDIR/.locks, so it survives the
+    atomic replace of the file itself.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks[path]
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        lock_directory = os.path.join(os.path.realpath(WORKDIR), ".locks")
+        os.makedirs(lock_directory, exist_ok=True)
+        lock_name = hashlib.sha1(path.encode("utf-8")).hexdigest() + ".lock"
+        with open(os.path.join(lock_directory, lock_name), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(path, data):
+    """Replace path with data, so readers see either the old or the new file.
+
+    The file keeps its mode; a new file gets the umask's default, as open()
+    would give it, instead of mkstemp's owner-only 0600.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.chmod(temporary_path, mode)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+@contextmanager
+def _mapped(path):
+    """The file's bytes, memory-mapped so large files are paged in on demand."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""  # empty files cannot be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def read_lines(path, start_line=1, max_lines=READ_MAX_LINES):
+    """(lines, remaining_bytes): up to max_lines lines from start_line (1-based)."""
+    lines = []
+    with _mapped(path) as data:
+        position = 0
+        for _ in range(start_line - 1):
+            position = data.find(b"\n", position) + 1
+            if position == 0:
+                return [], 0
+        while len(lines) < max_lines and position < len(data):
+            end = data.find(b"\n", position)
+            end = len(data) if end == -1 else end + 1
+            line = data[position:end].decode("utf-8", errors="replace")
+            lines.append(line.rstrip("\n"))
+            position = end
+        return lines, len(data) - position
+
+
+def grep_lines(path, pattern, max_matches=GREP_MAX_MATCHES):
+    """(line number, line) pairs matching a case-insensitive regex or literal text."""
+    try:
+        regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+    except re.error:
+        regex = re.compile(re.escape(pattern.encode("utf-8")), re.IGNORECASE)
+    matches = []
+    with _mapped(path) as data:
+        position, line_number = 0, 1
+        for match in regex.finditer(data):
+            if match.start() < position:
+                continue  # another match on a line already reported
+            line_number += data[position : match.start()].count(b"\n")
+            start = data.rfind(b"\n", 0, match.start()) + 1
+            end = data.find(b"\n", match.end())
+            end = len(data) if end == -1 else end
+            line = data[start:end].decode("utf-8", errors="replace")
+            matches.append((line_number, line))
+            if len(matches) >= max_matches:
+                break
+            position = end
+    return matches
+
+
+def _flag(value):
+    return str(value).strip().lower() in ("true", "1", "yes")
+
 
 class FileTools:
     @tool("Write File with content")
-    def write_file(data, relative_path):
+    @track_tool("write_file")
+    def write_file(data, relative_path, append=False):
         """Useful to write a file to a given relative path with the given content.
         The input to this tool should be the content you want to write to the file,
         and the relative path of the file, excluding the /workdir prefix.
         For example, `notes.txt|This is the content`.
-        Replace 'This is the content' with the actual content you want to write to the file."""
+        Replace 'This is the content' with the actual content you want to write
+        to the file.
+        Set append to true to add the content to the end of the file
+        instead of replacing it."""
         try:
-            path = (
-                f"./workdir/{relative_path}".replace("\n", "")
-                .replace(" ", "")
-                .replace("`", "")
-            )
-            with open(path, "w") as f:
-                f.write(data)
-            return f"File written to {path}."
+            path = resolve_path(relative_path)
+            with file_lock(path):
+                if _flag(append):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(data)
+                else:
+                    write_atomic(path, data)
+            return f"File {'appended to' if _flag(append) else 'written to'} {path}."
+        except FileToolError as e:
+            return f"Error: {e}"
         except Exception:
             return "Error with the input format for the tool."
 
     @tool("Read File content")
-    def read_file(relative_path):
+    @track_tool("read_file")
+    def read_file(relative_path, start_line=1, max_lines=READ_MAX_LINES, pattern=""):
         """Useful to read a file from a given relative path.
         The input to this tool should be the relative path of the file, excluding the /workdir prefix.
         For example, `notes.txt`.
-        Returns the content of the file as a string."""
+        Returns at most max_lines lines starting at start_line;
+        read further with a later start_line.
+        Set pattern to return only the lines matching it, with their line numbers."""
         try:
-            path = (
-                f"./workdir/{relative_path}".replace("\n", "")
-                .replace(" ", "")
-                .replace("`", "")
-            )
-            with open(path, "r") as f:
-                content = f.read()
+            path = resolve_path(relative_path)
+            start_line, max_lines = max(1, int(start_line)), max(1, int(max_lines))
+            with file_lock(path, exclusive=False):
+                if pattern:
+                    matches = grep_lines(
+                        path, str(pattern), min(max_lines, GREP_MAX_MATCHES)
+                    )
+                    if not matches:
+                        return f"No lines matching '{pattern}'."
+                    return "\n".join(f"{number}: {line}" for number, line in matches)
+                lines, remaining_bytes = read_lines(path, start_line, max_lines)
+            if not lines and start_line > 1:
+                return f"The file has fewer than {start_line} lines."
+            content = "\n".join(lines)
+            if remaining_bytes:
+                content += (
+                    f"\n[... {remaining_bytes} more bytes; read again with "
+                    f"start_line={start_line + len(lines)} or search with a pattern]"
+                )
             return content
+        except FileToolError as e:
+            return f"Error: {e}"
         except Exception:
             return "Error reading the file. Check if the path is correct."
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tools.rate_limiter import backoff_delay
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HttpClientError(Exception):
+    pass
+
+
+class EndpointMetrics:
+    def __init__(self, window=1000):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds, ok, retries):
+        self.calls += 1
+        self.retries += retries
+        self.total_seconds += seconds
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "p50_seconds": percentile(0.50),
+            "p95_seconds": percentile(0.95),
+        }
+
+
+class HttpClient:
+    """Pooled requests session with bounded timeouts and jittered retries."""
+
+    def __init__(
+        self,
+        pool_size=20,
+        connect_timeout=5.0,
+        read_timeout=30.0,
+        max_retries=4,
+        backoff_base=0.5,
+        backoff_max=20.0,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.metrics = defaultdict(EndpointMetrics)
+        self._metrics_lock = threading.Lock()
+
+    def _backoff(self, attempt, response=None):
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+
+    def post_json(self, url, payload, headers=None, endpoint=None, limiter=None):
+        """POST a JSON payload and return the decoded JSON body.
+
+        Retries connection errors, timeouts, 429 and 5xx responses. Raises
+        HttpClientError once the retries are exhausted, on any other
+        non-2xx status, or when the body is not JSON. With limiter (a
+        tools.rate_limiter Backend), every attempt waits for a slot and a
+        429 pauses all of that backend's callers instead of only this one.
+        """
+        endpoint = endpoint or url
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            with limiter.slot() if limiter else nullcontext() as call:
+                try:
+                    response = self.session.post(
+                        url, json=payload, headers=headers, timeout=self.timeout
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                throttled = response is not None and response.status_code == 429
+                if call is not None and throttled:
+                    delay = self._backoff(attempt, response)
+                    call.throttled(delay)
+                elif call is not None and error is None and response.ok:
+                    call.succeeded()
+
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if retryable and attempt < self.max_retries:
+                # A limiter with a request bucket already holds every caller
+                # back after a 429; without one, this caller has to wait
+                if not (
+                    call is not None and throttled and limiter.requests is not None
+                ):
+                    time.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+
+            ok = error is None and response.ok
+            self._record(endpoint, time.perf_counter() - started, ok, attempt)
+            if error is not None:
+                raise HttpClientError(f"{endpoint} request failed: {error}") from error
+            if not response.ok:
+                raise HttpClientError(
+                    f"{endpoint} returned HTTP {response.status_code}: "
+                    f"{response.text[:200]}"
+                )
+            try:
+                return response.json()
+            except ValueError as e:
+                raise HttpClientError(
+                    f"{endpoint} returned a body that is not JSON: "
+                    f"{response.text[:200]}"
+                ) from e
+
+    def _record(self, endpoint, seconds, ok, retries):
+        with self._metrics_lock:
+            self.metrics[endpoint].record(seconds, ok, retries)
+
+    def metrics_summary(self):
+        with self._metrics_lock:
+            return {
+                endpoint: metrics.summary()
+                for endpoint, metrics in sorted(self.metrics.items())
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide HttpClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(
+                    pool_size=int(os.environ.get("HTTP_POOL_SIZE", "20")),
+                    connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+                    read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", "30")),
+                    max_retries=int(os.environ.get("HTTP_MAX_RETRIES", "4")),
+                )
+    return _client
@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DAY = 24 * 60 * 60
+
+# Seconds a stored cell stays fresh, per research dimension. Budget and
+# lifestyle scores are computed against the user's own budget and lifestyle,
+# so they are never stored. Safety and amenities scores also weigh the
+# user's safety concerns and facilities; their cells are keyed by those
+# preference fields too (see KnowledgeStore).
+STALENESS = {
+    "safety": int(os.environ.get("KNOWLEDGE_TTL_SAFETY", str(30 * DAY))),
+    "amenities": int(os.environ.get("KNOWLEDGE_TTL_AMENITIES", str(90 * DAY))),
+    "reviews": int(os.environ.get("KNOWLEDGE_TTL_REVIEWS", str(30 * DAY))),
+}
+
+KNOWLEDGE_STORE_PATH = os.environ.get(
+    "KNOWLEDGE_STORE_PATH", "./workdir/knowledge_store.sqlite"
+)
+
+
+class KnowledgeStore:
+    """Per-city research results keyed by (city, neighborhood, dimension, preferences).
+
+    Each cell keeps the record an agent produced (score, summary, sources)
+    and when it was fetched, so a later evaluation of the same city only has
+    to research the cells that are missing or older than their dimension's
+    staleness policy. preferences is the JSON of the preference fields the
+    dimension's task reads ("" for none), so a score researched for one
+    user's concerns is never served to a user with different ones.
+    """
+
+    def __init__(self, path=KNOWLEDGE_STORE_PATH, staleness=None):
+        self.path = path
+        self.staleness = dict(STALENESS if staleness is None else staleness)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cells (
+                    city TEXT NOT NULL,
+                    neighborhood TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    preferences TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    summary TEXT NOT NULL,
+                    sources TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (city, neighborhood, dimension, preferences)
+                )"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _city(city):
+        return " ".join(city.split()).casefold()
+
+    def tracks(self, dimension):
+        return dimension in self.staleness
+
+    def neighborhoods(self, city):
+        """Every neighborhood stored for the city, in any dimension."""
+        with self._lock:
+            rows = self._connect().execute(
+                """SELECT DISTINCT neighborhood FROM cells
+                WHERE city = ? ORDER BY neighborhood""",
+                (self._city(city),),
+            ).fetchall()
+        return [neighborhood for (neighborhood,) in rows]
+
+    def lookup(self, city, dimension, neighborhoods, preferences=""):
+        """Split a dimension of the city into fresh records and cells to research.
+
+        Returns (fresh, stale): fresh is a list of NeighborhoodRecords still
+        within the staleness policy, stale the names from neighborhoods that
+        are missing or out of date.
+        """
+        from tasks.taskOutputs import NeighborhoodRecord
+
+        cutoff = time.time() - self.staleness[dimension]
+        with self._lock:
+            rows = self._connect().execute(
+                """SELECT neighborhood, score, summary, sources FROM cells
+                WHERE city = ? AND dimension = ? AND preferences = ?
+                AND fetched_at >= ?""",
+                (self._city(city), dimension, preferences, cutoff),
+            ).fetchall()
+        fresh = [
+            NeighborhoodRecord(
+                neighborhood=neighborhood,
+                score=score,
+                summary=summary,
+                sources=json.loads(sources),
+            )
+            for neighborhood, score, summary, sources in rows
+        ]
+        known = {record.neighborhood for record in fresh}
+        return fresh, [name for name in neighborhoods if name not in known]
+
+    def put(self, city, dimension, records, preferences=""):
+        if not self.tracks(dimension):
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self._city(city),
+                        record.neighborhood.strip(),
+                        dimension,
+                        preferences,
+                        record.score,
+                        record.summary,
+                        json.dumps(record.sources),
+                        now,
+                    )
+                    for record in records
+                ],
+            )
+            conn.commit()
+
+    def clear(self, city=None):
+        with self._lock:
+            conn = self._connect()
+            if city is None:
+                conn.execute("DELETE FROM cells")
+            else:
+                conn.execute("DELETE FROM cells WHERE city = ?", (self._city(city),))
+            conn.commit()
@@ -0,0 +1,243 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Requests (and tokens) per minute allowed for each backend; 0 disables a bucket.
+# "web" covers pages fetched by the scrape tool.
+BACKEND_LIMITS = {
+    "serper_search": {"requests": "RATE_LIMIT_SERPER_SEARCH_RPM", "default_rpm": 300},
+    "serper_news": {"requests": "RATE_LIMIT_SERPER_NEWS_RPM", "default_rpm": 300},
+    "openai": {
+        "requests": "RATE_LIMIT_OPENAI_RPM",
+        "default_rpm": 500,
+        "tokens": "RATE_LIMIT_OPENAI_TPM",
+        "default_tpm": 30000,
+    },
+    "groq": {
+        "requests": "RATE_LIMIT_GROQ_RPM",
+        "default_rpm": 30,
+        "tokens": "RATE_LIMIT_GROQ_TPM",
+        "default_tpm": 6000,
+    },
+    "web": {"requests": "RATE_LIMIT_WEB_RPM", "default_rpm": 120},
+}
+MAX_CONCURRENCY = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+INITIAL_CONCURRENCY = int(os.environ.get("RATE_LIMIT_INITIAL_CONCURRENCY", "4"))
+# Throttling responses closer together than this count as one overload signal
+DECREASE_COOLDOWN = 1.0
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0, retry_after=None):
+    """Seconds to wait before a retry: Retry-After when given, else full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class TokenBucket:
+    """Refills at rate units per second, holding at most one second's worth.
+
+    take() may drive the level below zero for amounts larger than the
+    capacity, so large requests are admitted but still paid for by the
+    callers after them.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # _updated lies in the future while the bucket is paused
+        if now > self._updated:
+            self._level = min(
+                self.capacity, self._level + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+    def take(self, amount=1.0):
+        """Block until amount can be taken; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._paused_until - now
+                if delay <= 0:
+                    needed = min(amount, self.capacity)
+                    if self._level >= needed:
+                        self._level -= amount
+                        return waited
+                    delay = (needed - self._level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount):
+        """Charge (or refund, when negative) amount without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level - amount)
+
+    def pause(self, seconds):
+        """Admit nothing for seconds, then resume from an empty bucket."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._level = min(self._level, 0.0)
+            self._updated = max(self._updated, self._paused_until)
+
+
+class AdaptiveConcurrency:
+    """Limit on calls in flight, adjusted by additive increase, multiplicative decrease.
+
+    Each success while the limit was reached adds 1/limit, so the limit grows
+    by about one per round of calls when there is headroom; an overload
+    signal halves it.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=MAX_CONCURRENCY, minimum=1):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            # Whether this call used the last free slot
+            return self.in_flight >= int(self.limit)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def increase(self):
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def decrease(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+class RateLimitedCall:
+    """One admitted call; report its outcome with succeeded() or throttled()."""
+
+    def __init__(self, backend, estimated_tokens, at_limit):
+        self.backend = backend
+        self.estimated_tokens = estimated_tokens
+        self.at_limit = at_limit
+
+    def succeeded(self, used_tokens=None):
+        # Only grow when the limit was what held calls back
+        if self.at_limit:
+            self.backend.concurrency.increase()
+        if self.backend.tokens is not None and used_tokens is not None:
+            self.backend.tokens.adjust(used_tokens - self.estimated_tokens)
+
+    def failed(self):
+        """The call raised before using its quota: refund its token estimate."""
+        if self.backend.tokens is not None:
+            self.backend.tokens.adjust(-self.estimated_tokens)
+
+    def throttled(self, seconds):
+        """The API answered 429: halve concurrency, pause every caller for seconds."""
+        self.backend.throttled(seconds)
+
+
+class Backend:
+    """Request bucket, optional token bucket and adaptive concurrency for one API."""
+
+    def __init__(
+        self, name, requests_per_minute, tokens_per_minute=0, concurrency=None
+    ):
+        self.name = name
+        self.requests = (
+            TokenBucket(requests_per_minute / 60) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute / 60) if tokens_per_minute else None
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.calls = 0
+        self.throttled_calls = 0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, tokens=0):
+        """Hold a concurrency slot and the call's share of each bucket."""
+        started = time.monotonic()
+        at_limit = self.concurrency.acquire()
+        try:
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None and tokens:
+                self.tokens.take(tokens)
+            with self._lock:
+                self.calls += 1
+                self.waited_seconds += time.monotonic() - started
+            yield RateLimitedCall(self, tokens, at_limit)
+        finally:
+            self.concurrency.release()
+
+    def throttled(self, seconds):
+        with self._lock:
+            self.throttled_calls += 1
+        self.concurrency.decrease()
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.pause(seconds)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled_calls,
+                "waited_seconds": self.waited_seconds,
+                "concurrency_limit": round(self.concurrency.limit, 2),
+            }
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def rate_limiter(name):
+    """Return the process-wide Backend limiter for name, creating it on first use."""
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                limits = BACKEND_LIMITS[name]
+                backend = _backends[name] = Backend(
+                    name,
+                    float(os.environ.get(limits["requests"], limits["default_rpm"])),
+                    float(
+                        os.environ.get(
+                            limits.get("tokens", ""), limits.get("default_tpm", 0)
+                        )
+                    ),
+                )
+    return backend
+
+
+def rate_limit_summary():
+    with _backends_lock:
+        return {name: backend.summary() for name, backend in sorted(_backends.items())}
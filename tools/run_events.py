@@ -0,0 +1,68 @@
+import contextvars
+import queue
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# type is one of "task_started", "tool_call", "neighborhood_score", "ranking",
+# "task_finished", "finished" and "error"; data holds the type's fields.
+RunEvent = namedtuple("RunEvent", ["type", "agent", "task", "data", "time"])
+
+_current_stream = contextvars.ContextVar("run_events", default=None)
+
+
+class RunCancelled(Exception):
+    """Raised inside a run whose event consumer has stopped listening."""
+
+
+class EventStream:
+    """Thread-safe queue of RunEvents, iterated until the run ends."""
+
+    _END = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.closed = False
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def end(self):
+        self._queue.put(self._END)
+
+    def close(self):
+        """Called by the consumer: no new tasks are started for this run."""
+        self.closed = True
+
+    def __iter__(self):
+        while True:
+            event = self._queue.get()
+            if event is self._END:
+                return
+            yield event
+
+
+@contextmanager
+def publish_events(stream):
+    """Send events emitted in this context (and copies of it) to stream."""
+    token = _current_stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_stream.reset(token)
+
+
+def emit(type, agent=None, task=None, **data):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.put(RunEvent(type, agent, task, data, time.time()))
+
+
+def publishing():
+    return _current_stream.get() is not None
+
+
+def check_cancelled():
+    stream = _current_stream.get()
+    if stream is not None and stream.closed:
+        raise RunCancelled()
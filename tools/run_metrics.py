@@ -0,0 +1,296 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tools.run_events import emit, publishing
+from tools.text_chunker import count_tokens
+
+RUN_METRICS_FILE = "run_metrics.json"
+UNATTRIBUTED = "unattributed"
+
+_current_metrics = contextvars.ContextVar("run_metrics", default=None)
+_current_scope = contextvars.ContextVar(
+    "run_metrics_scope", default=(UNATTRIBUTED, UNATTRIBUTED)
+)
+
+
+class _Stats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class RunMetrics:
+    """Token, latency and call counts of one run, keyed by (agent, task)."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.llm = defaultdict(_Stats)
+        self.tools = defaultdict(_Stats)
+        self.routes = defaultdict(int)
+        self.caches = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+
+    def record_llm(
+        self, agent, task, seconds, prompt_tokens, completion_tokens, ok=True
+    ):
+        with self._lock:
+            stats = self.llm[(agent, task)]
+            stats.calls += 1
+            stats.errors += 0 if ok else 1
+            stats.seconds += seconds
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+
+    def record_route(self, agent, task, route, model, reason):
+        """Count one model routing decision (see agents.modelRouter)."""
+        with self._lock:
+            self.routes[(agent, task, route, model, reason)] += 1
+
+    def record_cache(self, cache, namespace, hit):
+        """Count one lookup in a cache such as the search cache."""
+        with self._lock:
+            self.caches[(cache, namespace)][0 if hit else 1] += 1
+
+    def llm_usage(self, agent, task):
+        """A copy of the LLM stats of (agent, task) so far."""
+        usage = _Stats()
+        with self._lock:
+            if (agent, task) in self.llm:
+                vars(usage).update(self.llm[(agent, task)].as_dict())
+        return usage
+
+    def record_tool(self, agent, task, tool, seconds, ok=True):
+        with self._lock:
+            stats = self.tools[(agent, task, tool)]
+            stats.calls += 1
+            stats.errors += 0 if ok else 1
+            stats.seconds += seconds
+
+    def report(self):
+        with self._lock:
+            llm = [
+                {"agent": agent, "task": task, **stats.as_dict()}
+                for (agent, task), stats in sorted(self.llm.items())
+            ]
+            tools = [
+                {
+                    "agent": agent,
+                    "task": task,
+                    "tool": tool,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "seconds": stats.seconds,
+                }
+                for (agent, task, tool), stats in sorted(self.tools.items())
+            ]
+            routing = [
+                {
+                    "agent": agent,
+                    "task": task,
+                    "route": route,
+                    "model": model,
+                    "reason": reason,
+                    "calls": calls,
+                }
+                for (agent, task, route, model, reason), calls in sorted(
+                    self.routes.items()
+                )
+            ]
+            caches = [
+                {"cache": cache, "namespace": namespace, "hits": hits, "misses": misses}
+                for (cache, namespace), (hits, misses) in sorted(self.caches.items())
+            ]
+        return {
+            "started": self.started,
+            "wall_clock_seconds": time.time() - self.started,
+            "totals": {
+                "llm_calls": sum(row["calls"] for row in llm),
+                "prompt_tokens": sum(row["prompt_tokens"] for row in llm),
+                "completion_tokens": sum(row["completion_tokens"] for row in llm),
+                "tool_calls": sum(row["calls"] for row in tools),
+            },
+            "llm": llm,
+            "tools": tools,
+            "routing": routing,
+            "caches": caches,
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def console_summary(self):
+        report = self.report()
+        per_agent = defaultdict(lambda: [0, 0, 0, 0.0])
+        for row in report["llm"]:
+            totals = per_agent[row["agent"]]
+            totals[0] += row["calls"]
+            totals[1] += row["prompt_tokens"] + row["completion_tokens"]
+            totals[3] += row["seconds"]
+        for row in report["tools"]:
+            totals = per_agent[row["agent"]]
+            totals[2] += row["calls"]
+            totals[3] += row["seconds"]
+
+        lines = [
+            f"{'Agent':<34}{'LLM calls':>10}{'Tokens':>10}"
+            f"{'Tool calls':>12}{'Seconds':>10}"
+        ]
+        for agent, (llm_calls, tokens, tool_calls, seconds) in sorted(
+            per_agent.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(f"{agent:<34}{llm_calls:>10}{tokens:>10}{tool_calls:>12}{seconds:>10.1f}")
+        totals = report["totals"]
+        lines.append(
+            f"Total: {totals['llm_calls']} LLM calls, "
+            f"{totals['prompt_tokens'] + totals['completion_tokens']} tokens, "
+            f"{totals['tool_calls']} tool calls in {report['wall_clock_seconds']:.1f}s"
+        )
+        for row in report["caches"]:
+            lines.append(
+                f"{row['cache'].capitalize()} cache {row['namespace']}: "
+                f"{row['hits']} hits, {row['misses']} misses"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect_metrics(metrics=None):
+    """Make metrics (a new RunMetrics by default) the collector for this context."""
+    metrics = metrics or RunMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextmanager
+def metrics_scope(agent, task):
+    """Attribute LLM and tool calls made in this context to an agent and task."""
+    token = _current_scope.set((agent, task))
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def track_tool(name):
+    """Decorator recording the latency of a tool function in the current run.
+
+    Each call is also published as a "tool_call" run event.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = _current_metrics.get()
+            if metrics is None and not publishing():
+                return fn(*args, **kwargs)
+            agent, task = _current_scope.get()
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = not (isinstance(result, str) and result.startswith("Error"))
+                return result
+            finally:
+                seconds = time.perf_counter() - started
+                if metrics is not None:
+                    metrics.record_tool(agent, task, name, seconds, ok)
+                emit("tool_call", agent, task, tool=name, seconds=seconds, ok=ok)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """LangChain callback attributing every LLM call to the current run scope.
+
+    Token counts come from the provider's usage report; cached completions
+    and providers without one are counted with count_tokens instead.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, prompt_text):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return
+        with self._lock:
+            self._runs[run_id] = (
+                metrics,
+                _current_scope.get(),
+                time.perf_counter(),
+                prompt_text,
+            )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):  # noqa: ARG002
+        self._start(run_id, "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):  # noqa: ARG002
+        self._start(
+            run_id,
+            "\n".join(
+                str(message.content) for batch in messages for message in batch
+            ),
+        )
+
+    def _finish(self, run_id, response=None, ok=True):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        metrics, (agent, task), started, prompt_text = run
+        usage = ((response and response.llm_output) or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(prompt_text)
+        if completion_tokens is None:
+            completion_tokens = sum(
+                count_tokens(generation.text)
+                for generations in (response.generations if response else [])
+                for generation in generations
+            )
+        metrics.record_llm(
+            agent,
+            task,
+            time.perf_counter() - started,
+            prompt_tokens,
+            completion_tokens,
+            ok,
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):  # noqa: ARG002
+        self._finish(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):  # noqa: ARG002
+        self._finish(run_id, ok=False)
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def current_scope():
+    return _current_scope.get()
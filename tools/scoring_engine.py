@@ -0,0 +1,193 @@
+import math
+import re
+
+import numpy as np
+
+# Research task name -> key of user_preferences describing how much it matters
+DIMENSIONS = {
+    "safety": "safety",
+    "amenities": "facilities",
+    "budget": "budget",
+    "lifestyle": "lifestyle",
+    "reviews": None,
+}
+
+# Importance phrases found in a preference; the first match wins. Only
+# phrases about importance count, so "low crime rate preferred" or "low
+# budget" say nothing about weight. Negations come first so "not important"
+# is not read as "important".
+IMPORTANCE = [
+    (
+        re.compile(
+            r"\b(low (importance|priority)|not (very )?(important|a priority)"
+            r"|unimportant|(don't|do not) care|doesn't matter)\b"
+        ),
+        0.5,
+    ),
+    (
+        re.compile(
+            r"\b(very high (importance|priority)|very important|critical|essential"
+            r"|must)\b"
+        ),
+        4.0,
+    ),
+    (re.compile(r"\b(high (importance|priority)|important)\b"), 3.0),
+    (re.compile(r"\b(medium|moderate) (importance|priority)\b"), 2.0),
+]
+# A stated preference without an importance word, and no preference at all
+STATED_WEIGHT = 2.0
+DEFAULT_WEIGHT = 1.0
+SCORE_RANGE = 10.0
+
+
+class ScoreTable:
+    """Scores (0-10) of every neighborhood in every dimension.
+
+    scores has one row per neighborhood and one column per dimension;
+    a neighborhood that a task did not report on is NaN in that column.
+    """
+
+    def __init__(self, neighborhoods, dimensions, scores):
+        self.neighborhoods = list(neighborhoods)
+        self.dimensions = list(dimensions)
+        self.scores = np.asarray(scores, dtype=float).reshape(
+            len(self.neighborhoods), len(self.dimensions)
+        )
+
+    @classmethod
+    def from_records(cls, records_by_dimension):
+        """Build a table from {dimension: [NeighborhoodRecord, ...]}."""
+        dimensions = list(records_by_dimension)
+        index = {}
+        for records in records_by_dimension.values():
+            for record in records:
+                index.setdefault(record.neighborhood.strip(), len(index))
+        scores = np.full((len(index), len(dimensions)), np.nan)
+        for column, records in enumerate(records_by_dimension.values()):
+            for record in records:
+                scores[index[record.neighborhood.strip()], column] = record.score
+        return cls(index, dimensions, scores)
+
+    def normalized(self):
+        """Scores scaled to 0-1 on the 0-10 range fixed by NeighborhoodRecord.
+
+        A missing score takes the mean of its dimension, so it neither
+        rewards nor punishes the neighborhood.
+        """
+        present = ~np.isnan(self.scores)
+        counts = present.sum(axis=0)
+        means = np.where(
+            counts > 0,
+            np.where(present, self.scores, 0.0).sum(axis=0) / np.maximum(counts, 1),
+            SCORE_RANGE / 2,
+        )
+        return np.where(present, self.scores, means) / SCORE_RANGE
+
+
+def explicit_weight(value):
+    """An explicit weight as a float of at least 0, or None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(weight):
+        return None
+    return max(weight, 0.0)
+
+
+def preference_weights(user_preferences, dimensions):
+    """Weight of each dimension for one user_preferences dict.
+
+    A valid explicit {"weights": {dimension: number}} entry wins, with
+    negative numbers raised to 0; otherwise the preference text is searched
+    for importance phrases such as "high importance". Weights that sum to
+    zero fall back to equal weights.
+    """
+    explicit = user_preferences.get("weights")
+    if not isinstance(explicit, dict):
+        explicit = {}
+    weights = []
+    for dimension in dimensions:
+        weight = explicit_weight(explicit.get(dimension))
+        if weight is not None:
+            weights.append(weight)
+            continue
+        preference = user_preferences.get(DIMENSIONS.get(dimension) or "", "")
+        text = str(preference).lower()
+        weight = STATED_WEIGHT if text else DEFAULT_WEIGHT
+        for pattern, importance in IMPORTANCE:
+            if pattern.search(text):
+                weight = importance
+                break
+        weights.append(weight)
+    weights = np.array(weights)
+    if weights.sum() <= 0:
+        return np.ones(len(dimensions))
+    return weights
+
+
+def composite_scores(table, weights):
+    """Weighted mean (0-10) of the normalized scores for a batch of profiles.
+
+    weights has shape (profiles, dimensions), or (dimensions,) for a single
+    profile; the result has shape (neighborhoods, profiles).
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    # Equal weights for profiles whose weights sum to zero
+    weights = np.where(weights.sum(axis=1, keepdims=True) > 0, weights, 1.0)
+    return SCORE_RANGE * (table.normalized() @ weights.T) / weights.sum(axis=1)
+
+
+def rank(table, weights):
+    """Neighborhood indices ordered best first, one column per profile."""
+    return np.argsort(-composite_scores(table, weights), axis=0, kind="stable")
+
+
+def rank_profiles(table, profiles):
+    """Rank the table for many user_preferences dicts in one batched call."""
+    weights = np.stack([preference_weights(p, table.dimensions) for p in profiles])
+    return rank(table, weights)
+
+
+def ranking(table, user_preferences, top=None):
+    """Ranked neighborhoods for one user, with the dimensions behind each score."""
+    weights = preference_weights(user_preferences, table.dimensions)
+    composite = composite_scores(table, weights)[:, 0]
+    # Share of each dimension in a neighborhood's composite score
+    contributions = SCORE_RANGE * table.normalized() * weights / weights.sum()
+    rows = []
+    for position in np.argsort(-composite, kind="stable")[:top]:
+        scores = table.scores[position]
+        shares = np.where(np.isnan(scores), 0.0, contributions[position])
+        rows.append(
+            {
+                "neighborhood": table.neighborhoods[position],
+                "score": round(float(composite[position]), 2),
+                "scores": {
+                    dimension: float(score)
+                    for dimension, score in zip(table.dimensions, scores, strict=True)
+                    if not np.isnan(score)
+                },
+                "drivers": [
+                    table.dimensions[i]
+                    for i in np.argsort(-shares)[:2]
+                    if shares[i] > 0
+                ],
+            }
+        )
+    return rows
+
+
+def format_ranking(rows):
+    lines = []
+    for place, row in enumerate(rows, start=1):
+        scores = ", ".join(
+            f"{dimension} {score:g}" for dimension, score in row["scores"].items()
+        )
+        lines.append(
+            f"{place}. {row['neighborhood']}: {row['score']:.1f}/10 ({scores}); "
+            f"strongest: {', '.join(row['drivers']) or 'n/a'}"
+        )
+    return "\n".join(lines)
@@ -1,69 +1,99 @@
-import json
 import os
+import re
 
-import requests
 from langchain.tools import tool
 
+from tools.corpus_index import index_text
+from tools.disk_cache import DiskCache
+from tools.http_client import HttpClientError, get_http_client
+from tools.rate_limiter import rate_limiter
+from tools.run_metrics import current_metrics, track_tool
+
+SEARCH_ENDPOINT = "/search"
+NEWS_ENDPOINT = "/news"
+RATE_LIMITERS = {SEARCH_ENDPOINT: "serper_search", NEWS_ENDPOINT: "serper_news"}
+SERPER_BASE_URL = os.environ.get("SERPER_BASE_URL", "https://google.serper.dev")
+
+search_cache = DiskCache(
+    os.environ.get("SEARCH_CACHE_PATH", "./workdir/search_cache.sqlite"),
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "5000")),
+    ttls={
+        SEARCH_ENDPOINT: float(os.environ.get("SEARCH_CACHE_TTL", 7 * 24 * 3600)),
+        NEWS_ENDPOINT: float(os.environ.get("NEWS_CACHE_TTL", 6 * 3600)),
+    },
+)
+
+
+def normalize_query(query):
+    """Collapse case, quoting and whitespace so near-identical queries share a key."""
+    query = query.strip().strip("\"'`").lower()
+    return re.sub(r"\s+", " ", query)
+
+
+def _serper_search(endpoint, query, result_key):
+    key = normalize_query(query)
+    results = search_cache.get(endpoint, key)
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.record_cache("search", endpoint, results is not None)
+    if results is None:
+        headers = {"X-API-KEY": os.environ["SERPER_API_KEY"]}
+        response = get_http_client().post_json(
+            f"{SERPER_BASE_URL}{endpoint}",
+            {"q": query},
+            headers=headers,
+            endpoint=endpoint,
+            limiter=rate_limiter(RATE_LIMITERS[endpoint]),
+        )
+        results = response.get(result_key) if isinstance(response, dict) else None
+        results = [result for result in results or [] if isinstance(result, dict)]
+        # An empty or malformed response is not worth replaying for the whole TTL
+        if results:
+            search_cache.set(endpoint, key, results)
+        for result in results:
+            if result.get("link"):
+                text = f"{result.get('title', '')}\n{result.get('snippet', '')}"
+                index_text(endpoint.strip("/"), result["link"], [text])
+    return results
+
+
+def _format_results(results, top_result_to_return=4):
+    string = []
+    for result in results[:top_result_to_return]:
+        try:
+            string.append(
+                "\n".join(
+                    [
+                        f"Title: {result['title']}",
+                        f"Link: {result['link']}",
+                        f"Snippet: {result['snippet']}",
+                        "\n-----------------",
+                    ]
+                )
+            )
+        except KeyError:
+            continue
+
+    return "\n".join(string)
+
 
 class SearchTools:
     @tool("Search the internet")
+    @track_tool("search_internet")
     def search_internet(query):
         """Useful to search the internet
         about a a given topic and return relevant results"""
-        top_result_to_return = 4
-        url = "https://google.serper.dev/search"
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": os.environ["SERPER_API_KEY"],
-            "content-type": "application/json",
-        }
-        response = requests.request("POST", url, headers=headers, data=payload)
-        results = response.json()["organic"]
-        string = []
-        for result in results[:top_result_to_return]:
-            try:
-                string.append(
-                    "\n".join(
-                        [
-                            f"Title: {result['title']}",
-                            f"Link: {result['link']}",
-                            f"Snippet: {result['snippet']}",
-                            "\n-----------------",
-                        ]
-                    )
-                )
-            except KeyError:
-                next
-
-        return "\n".join(string)
+        try:
+            return _format_results(_serper_search(SEARCH_ENDPOINT, query, "organic"))
+        except HttpClientError as e:
+            return f"Error searching the internet: {e}"
 
     @tool("Search news on the internet")
+    @track_tool("search_news")
     def search_news(query):
         """Useful to search news about a company, stock or any other
-    topic and return relevant results""" ""
-        top_result_to_return = 4
-        url = "https://google.serper.dev/news"
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": os.environ["SERPER_API_KEY"],
-            "content-type": "application/json",
-        }
-        response = requests.request("POST", url, headers=headers, data=payload)
-        results = response.json()["news"]
-        string = []
-        for result in results[:top_result_to_return]:
-            try:
-                string.append(
-                    "\n".join(
-                        [
-                            f"Title: {result['title']}",
-                            f"Link: {result['link']}",
-                            f"Snippet: {result['snippet']}",
-                            "\n-----------------",
-                        ]
-                    )
-                )
-            except KeyError:
-                next
-
-        return "\n".join(string)
+        topic and return relevant results"""
+        try:
+            return _format_results(_serper_search(NEWS_ENDPOINT, query, "news"))
+        except HttpClientError as e:
+            return f"Error searching news: {e}"
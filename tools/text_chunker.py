@@ -0,0 +1,175 @@
+import math
+import re
+from functools import lru_cache
+
+# A line is boilerplate when every piece between separators is one of these
+# phrases, so content such as "Best cookie bakery in the neighborhood" is kept.
+BOILERPLATE_PATTERNS = re.compile(
+    r"we use cookies(?: to [^.!]*)?|(?:accept|reject|manage)(?: all)?(?: cookies)?"
+    r"|cookie (?:policy|settings|preferences)|privacy policy|terms of (?:use|service)"
+    r"|all rights reserved|(?:©|copyright)[\w ]*|skip to (?:main )?content"
+    r"|sign in|log in|sign up|newsletter"
+    r"|(?:subscribe|sign up)(?: (?:to|for) our newsletter)?"
+    r"|follow us(?: on [\w ]+)?|share this(?: article| page| post)?"
+    r"|advertisement|back to top",
+    re.IGNORECASE,
+)
+BOILERPLATE_SEPARATORS = re.compile(r"[.,:;|/!·•-]+")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+# Runs of at least this many navigation-like lines (see _is_navigation) are
+# treated as menus or link lists.
+MIN_MENU_RUN = 3
+SHORT_LINE_WORDS = 4
+LINK = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+# Figures and "key: value" pairs are content, never navigation
+NOT_NAVIGATION = re.compile(r"[\d.!?:$%]")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, else estimate 4 chars per token."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _is_navigation(line):
+    """A bare link, or a short label such as "Home" or "Things to do"."""
+    if LINK.fullmatch(line):
+        return True
+    return len(line.split()) < SHORT_LINE_WORDS and not NOT_NAVIGATION.search(line)
+
+
+def _is_boilerplate(line):
+    pieces = [piece.strip() for piece in BOILERPLATE_SEPARATORS.split(line)]
+    pieces = [piece for piece in pieces if piece]
+    return bool(pieces) and all(
+        BOILERPLATE_PATTERNS.fullmatch(piece) for piece in pieces
+    )
+
+
+def strip_boilerplate(text):
+    """Drop cookie banners, menus, footers and repeated lines from scraped text."""
+    lines = [re.sub(r"\s+", " ", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+
+    kept = []
+    run = []
+    seen = set()
+
+    def flush_run():
+        if len(run) < MIN_MENU_RUN:
+            kept.extend(run)
+        run.clear()
+
+    for line in lines:
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        if len(line) < 200 and _is_boilerplate(line):
+            continue
+        if _is_navigation(line):
+            run.append(line)
+            continue
+        flush_run()
+        kept.append(line)
+    flush_run()
+
+    return "\n".join(kept)
+
+
+def _hard_split(text, max_tokens):
+    """Cut text without usable breaks, such as one huge token, by characters."""
+    pieces = []
+    while text:
+        size = min(len(text), max_tokens * 4)
+        while size > 1 and count_tokens(text[:size]) > max_tokens:
+            size //= 2
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+def _split_unit(unit, max_tokens):
+    """Break a unit that is over budget into sentences, then into word runs.
+
+    A word run still over budget is cut by characters.
+    """
+    if count_tokens(unit) <= max_tokens:
+        return [unit]
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(unit):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        # Half the budget in words keeps ordinary text under budget without
+        # re-tokenizing every prefix.
+        step = max(1, max_tokens // 2)
+        for i in range(0, len(words), step):
+            run = " ".join(words[i : i + step])
+            if count_tokens(run) <= max_tokens:
+                pieces.append(run)
+            else:
+                pieces.extend(_hard_split(run, max_tokens))
+    return pieces
+
+
+def chunk_text(text, max_tokens, overlap_tokens=0):
+    """Pack paragraphs (lines) and sentences into chunks of at most max_tokens tokens.
+
+    The last overlap_tokens worth of units of a chunk are repeated at the
+    start of the next one so context is not lost at a boundary.
+    """
+    units = []
+    for paragraph in text.split("\n"):
+        if paragraph.strip():
+            units.extend(_split_unit(paragraph.strip(), max_tokens))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = count_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                previous_tokens = count_tokens(previous)
+                if carried_tokens + previous_tokens > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+            if carried_tokens + unit_tokens > max_tokens:
+                carried, carried_tokens = [], 0
+            current, current_tokens = carried, carried_tokens
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def prepare_chunks(content, max_tokens, overlap_tokens=0):
+    """Clean scraped content and chunk it, returning (chunks, stats)."""
+    cleaned = strip_boilerplate(content)
+    chunks = chunk_text(cleaned, max_tokens, overlap_tokens)
+    stats = {
+        "chars_in": len(content),
+        "tokens_in": count_tokens(content),
+        "tokens_out": sum(count_tokens(chunk) for chunk in chunks),
+        "chunks": len(chunks),
+    }
+    return chunks, stats
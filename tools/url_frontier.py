@@ -0,0 +1,143 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tools.single_flight import SingleFlight
+
+# Seconds between the starts of two fetches from the same host
+HOST_DELAY = float(os.environ.get("SCRAPE_HOST_DELAY", "1.0"))
+HOST_CONCURRENCY = int(os.environ.get("SCRAPE_HOST_CONCURRENCY", "2"))
+# Distinct URLs that may be queued or fetching at once; more are refused
+MAX_PENDING = int(os.environ.get("SCRAPE_MAX_PENDING", "32"))
+
+TRACKING_PARAMETERS = re.compile(
+    r"^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid)$", re.IGNORECASE
+)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class FrontierFull(Exception):
+    pass
+
+
+def normalize_url(url):
+    """Canonical form of url, so spellings of one page share a fetch and a cache entry.
+
+    Lower-cases the scheme and host, drops default ports, fragments and
+    tracking parameters, and sorts the query. URLs without a scheme get https.
+    """
+    url = str(url).strip().strip("`'\"").strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not TRACKING_PARAMETERS.match(name)
+        )
+    )
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class _Host:
+    def __init__(self, concurrency):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+
+class UrlFrontier:
+    """Process-wide gate for page fetches.
+
+    Concurrent requests for one normalized URL share a single fetch, fetches
+    from one host are spaced by host_delay with at most host_concurrency at
+    a time, and at most max_pending distinct URLs wait or run at once.
+    """
+
+    def __init__(
+        self,
+        host_delay=HOST_DELAY,
+        host_concurrency=HOST_CONCURRENCY,
+        max_pending=MAX_PENDING,
+    ):
+        self.host_delay = host_delay
+        self.host_concurrency = host_concurrency
+        self._flights = SingleFlight()
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._hosts = defaultdict(partial(_Host, host_concurrency))
+        self._hosts_lock = threading.Lock()
+        self.requests = 0
+        self.fetches = 0
+        self.refused = 0
+        self.shared_requests = 0
+        self.shared_runs = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, url, fetch):
+        """fetch(url) for the normalized url, shared with concurrent requests for it."""
+        url = normalize_url(url)
+        self._count("requests")
+        return self._flights.do(("fetch", url), partial(self._fetch, url, fetch))
+
+    def shared(self, key, fn):
+        """fn(), shared with concurrent callers of the same key.
+
+        For work derived from a page, such as its summary.
+        """
+        self._count("shared_requests")
+        return self._flights.do(("shared", key), partial(self._shared, fn))
+
+    def _shared(self, fn):
+        self._count("shared_runs")
+        return fn()
+
+    def _fetch(self, url, fetch):
+        if not self._pending.acquire(blocking=False):
+            self._count("refused")
+            raise FrontierFull("Too many pages are being fetched; try again later")
+        try:
+            with self._polite(urlsplit(url).netloc):
+                self._count("fetches")
+                return fetch(url)
+        finally:
+            self._pending.release()
+
+    @contextmanager
+    def _polite(self, host):
+        with self._hosts_lock:
+            state = self._hosts[host]
+        with state.slots:
+            with state.lock:
+                now = time.monotonic()
+                start = max(now, state.next_start)
+                state.next_start = start + self.host_delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "fetch_requests": self.requests,
+                "fetches": self.fetches,
+                "refused": self.refused,
+                "shared_requests": self.shared_requests,
+                "shared_runs": self.shared_runs,
+            }
+
+
+url_frontier = UrlFrontier()